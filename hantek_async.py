@@ -0,0 +1,207 @@
+import asyncio, threading
+from concurrent.futures import ThreadPoolExecutor
+
+#%% Settings
+
+# Longest time of one bulk read, s: cancellation takes effect within it
+READ_PERIOD = 0.01
+
+#%% Funcs
+
+def produce(scope, frames, slots, cancel, queue, loop):
+
+    # Producer of FrameStream on the I/O thread: captures into queue, None
+    # at the end, an exception if the capture failed
+    k = 0
+
+    try:
+
+        while frames is None or k < frames:
+
+            # Backpressure: wait for room, checking cancel
+            while not slots.acquire(timeout = 0.1):
+
+                if cancel.is_set():
+
+                    return
+
+            if cancel.is_set():
+
+                return
+
+            frame, results = scope.h0.CaptureChunked(scope.chunk(), cancel = cancel)
+
+            if frame is None:
+
+                return
+
+            loop.call_soon_threadsafe(queue.put_nowait, frame)
+
+            k += 1
+
+    except Exception as e:
+
+        loop.call_soon_threadsafe(queue.put_nowait, e)
+
+    finally:
+
+        loop.call_soon_threadsafe(queue.put_nowait, None)
+
+#%% Classes
+
+class AsyncHantek:
+
+    # asyncio facade over pyhantek6022BE.Hantek. Every call to h0 runs on one
+    # dedicated I/O thread (not the loop's default executor), so USB
+    # transfers never block the event loop and never run concurrently.
+    # Captures are read in short slices (READ_PERIOD), a cancelled capture
+    # stops after the slice in flight and drains the device (Hantek.Abort).
+    #
+    # async with AsyncHantek(h0) as scope:
+    #     frame = await scope.capture()
+    #     async for frame in scope.stream(maxsize = 2): ...
+
+    def __init__(self, h0, period = READ_PERIOD):
+
+        self.h0 = h0
+        self.period = period
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix = 'hantek-io')
+
+    async def __aenter__(self):
+
+        return self
+
+    async def __aexit__(self, *args):
+
+        await self.close()
+
+    async def run(self, func, *args):
+
+        # func(*args) on the I/O thread, e.g. scope.run(h0.set_chvdiv, [1, 1])
+        loop = asyncio.get_running_loop()
+
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def apply(self, config):
+
+        return await self.run(self.h0.apply, config)
+
+    def chunk(self):
+
+        # Slice of about period s at the current rate, multiple of 512 bytes
+        h0 = self.h0
+
+        n = int(h0.samplerate * h0.channels * self.period) // 512 * 512
+
+        return min(max(n, 512), h0.dictDatLen_N[h0.samplerate])
+
+    async def capture(self):
+
+        # One Frame, see Hantek.Capture
+        cancel = threading.Event()
+
+        loop = asyncio.get_running_loop()
+
+        job = loop.run_in_executor(self.executor, self.h0.CaptureChunked,
+                                   self.chunk(), None, None, cancel)
+
+        try:
+
+            frame, results = await asyncio.shield(job)
+
+        except asyncio.CancelledError:
+
+            # The I/O thread stops after the current slice
+            cancel.set()
+
+            raise
+
+        return frame
+
+    def stream(self, frames = None, maxsize = 2):
+
+        # Async iterator of back to back captures, frames - number of them,
+        # None - until closed. At most maxsize frames wait for the consumer,
+        # the next capture doesn't start until there is room.
+        return FrameStream(self, frames, maxsize)
+
+    async def close(self):
+
+        await self.run(self.h0.close)
+
+        self.executor.shutdown()
+
+class FrameStream:
+
+    # See AsyncHantek.stream. Leaving async for, aclose() or dropping the
+    # iterator stops the producer on the I/O thread.
+
+    def __init__(self, scope, frames, maxsize):
+
+        self.scope = scope
+        self.frames = frames
+        self.slots = threading.Semaphore(maxsize)
+        self.cancel = threading.Event()
+        self.queue = None
+        self.job = None
+
+    def __aiter__(self):
+
+        return self
+
+    async def __anext__(self):
+
+        if self.job is None:
+
+            loop = asyncio.get_running_loop()
+
+            self.queue = asyncio.Queue()
+
+            # The producer gets no reference to self: dropping the iterator
+            # calls __del__, which stops it
+            self.job = loop.run_in_executor(self.scope.executor, produce,
+                                            self.scope, self.frames, self.slots,
+                                            self.cancel, self.queue, loop)
+
+        if self.cancel.is_set():
+
+            raise StopAsyncIteration
+
+        item = await self.queue.get()
+
+        self.slots.release()
+
+        if item is None:
+
+            self.cancel.set()
+
+            raise StopAsyncIteration
+
+        if isinstance(item, Exception):
+
+            self.cancel.set()
+
+            raise item
+
+        return item
+
+    async def __aenter__(self):
+
+        return self
+
+    async def __aexit__(self, *args):
+
+        await self.aclose()
+
+    async def aclose(self):
+
+        # Stop and wait until the I/O thread is free
+        self.cancel.set()
+
+        if self.job is not None:
+
+            await asyncio.wait([self.job])
+
+    def __del__(self):
+
+        self.cancel.set()
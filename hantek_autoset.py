@@ -0,0 +1,198 @@
+import time
+import numpy as np
+from pyhantek6022BE import Config, nominal_cal
+from hantek_measure import measure
+
+#%% Settings
+
+# Bytes of a probe read (both channels), more at the lowest sample rate to
+# see slow signals (50 Hz)
+PROBE = 4096
+PROBE_SLOW = 16384
+
+# Smallest swing, codes, with a frequency: below it the crossings are noise
+MIN_SWING = 8
+
+# Part of the ADC range the signal may take
+MARGIN = 0.8
+
+# Whole periods in a capture
+PERIODS = 4
+
+# Sample rates of the frequency probes are this many times apart, and a
+# frequency counts with this many samples per period
+STEP = 10
+
+# 48 Msamples / s has gaps between packets, see hantek_gaps
+MAX_RATE = 16_000_000
+
+#%% Funcs
+
+def volts_range(h0, i, vdiv):
+
+    # Volts of codes 0 and 255 of channel i at vdiv
+    zero, scale = nominal_cal(vdiv) if h0.calibration is None else \
+        h0.calibration.coeffs(i, vdiv)
+
+    return -zero * scale, (255. - zero) * scale
+
+def fit_vdiv(h0, i, vmin, vmax, margin = MARGIN):
+
+    # The most sensitive V / DIV that keeps [vmin, vmax] within margin of
+    # the range, the widest if none does
+    vdivs = sorted(h0.dictVDiv_N.values())
+
+    for v in vdivs:
+
+        lo, hi = volts_range(h0, i, v)
+
+        if vmin >= margin * lo and vmax <= margin * hi:
+
+            return v
+
+    return vdivs[-1]
+
+def look(h0, length):
+
+    # Probe capture: raw extremes and measurements of every channel
+    frame = h0.Probe(length)
+
+    out = []
+
+    for i in range(frame.channels):
+
+        x = frame.ch(i)
+
+        zero, scale = frame.cal[i]
+
+        res = measure(x[None], zero, scale, frame.dt, ['vmin', 'vmax', 'vpp', 'freq'])[0]
+
+        res = {k: float(v[0]) for k, v in res.items()}
+
+        lo, hi = int(x.min()), int(x.max())
+
+        if hi - lo < MIN_SWING:
+
+            res['freq'] = np.nan
+
+        # Clipping: the ADC limits in the data
+        res['clipped'] = lo == 0 or hi == 255
+
+        out.append(res)
+
+    return out
+
+def autoset(h0, max_rate = MAX_RATE, periods = PERIODS, margin = MARGIN,
+            source = None):
+
+    # V / DIV of every channel and the sample rate from a few short probe
+    # reads (Hantek.Probe) instead of full captures:
+    # 1. widest range, lowest and highest rate: the extremes of many samples
+    #    give the levels of any signal, so V / DIV in one go;
+    # 2. frequency of source (None - the channel with the largest swing) at
+    #    rates STEP times apart, from the fastest probe that holds periods
+    #    with enough samples per period (no aliases);
+    # 3. the highest rate whose capture holds periods, a last probe checks
+    #    for clipping (V / DIV goes up while clipped).
+    # Returns a report: samplerate, ChVDiv, source, freq, vpp (step 1),
+    # clipped (at the widest range or the last probe), probes, time (s).
+    t0 = time.perf_counter()
+
+    rates = sorted(r for r in h0.dictSR_N.values() if r <= max_rate)
+    vdivs = sorted(h0.dictVDiv_N.values())
+
+    channels = range(h0.channels)
+
+    h0.apply(Config(rates[0], [vdivs[-1]] * 2))
+
+    slow = look(h0, PROBE_SLOW)
+
+    h0.apply(Config(rates[-1]))
+
+    fast = look(h0, PROBE)
+    probes = 2
+
+    # A signal at a multiple of one sample rate looks like DC at it
+    levels = [{'vmin': min(a['vmin'], b['vmin']), 'vmax': max(a['vmax'], b['vmax']),
+               'clipped': a['clipped'] or b['clipped']} for a, b in zip(slow, fast)]
+
+    ChVDiv = list(h0.ChVDiv)
+
+    for i, l in enumerate(levels):
+
+        l['vpp'] = l['vmax'] - l['vmin']
+
+        ChVDiv[i] = fit_vdiv(h0, i, l['vmin'], l['vmax'], margin)
+
+    if source is None:
+
+        source = max(channels, key = lambda i: levels[i]['vpp'])
+
+    # Rungs of the frequency ladder: the lowest rate, then STEP times up
+    ladder = [rates[0]]
+
+    for r in rates:
+
+        if r >= ladder[-1] * STEP:
+
+            ladder.append(r)
+
+    if ladder[-1] != rates[-1]:
+
+        ladder.append(rates[-1])
+
+    freq = np.nan
+
+    for r in ladder:
+
+        if r == rates[0] and ChVDiv[source] == vdivs[-1]:
+
+            # Step 1 already looked at source this way
+            res = slow
+
+        else:
+
+            h0.apply(Config(r, ChVDiv))
+
+            res = look(h0, PROBE_SLOW if r == rates[0] else PROBE)
+            probes += 1
+
+        f = res[source]['freq']
+
+        # At least STEP samples per period
+        if np.isfinite(f) and f <= r / STEP:
+
+            freq = f
+
+    # The highest rate with periods in a capture, DC - the fastest
+    fits = [r for r in rates
+            if np.isfinite(freq) and h0.dictDatLen_N[r] // h0.channels / r >= periods / freq]
+
+    rate = fits[-1] if fits else rates[-1] if not np.isfinite(freq) else rates[0]
+
+    while True:
+
+        h0.apply(Config(rate, ChVDiv))
+
+        res = look(h0, PROBE)
+        probes += 1
+
+        # Clipped: the next wider range
+        clipped = [i for i in channels if res[i]['clipped'] and ChVDiv[i] != vdivs[-1]]
+
+        if not clipped:
+
+            break
+
+        for i in clipped:
+
+            ChVDiv[i] = vdivs[vdivs.index(ChVDiv[i]) + 1]
+
+    return {'samplerate': rate,
+            'ChVDiv': list(h0.ChVDiv),
+            'source': source,
+            'freq': freq,
+            'vpp': [l['vpp'] for l in levels],
+            'clipped': [l['clipped'] or r['clipped'] for l, r in zip(levels, res)],
+            'probes': probes,
+            'time': time.perf_counter() - t0}
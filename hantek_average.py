@@ -0,0 +1,199 @@
+import numpy as np
+
+#%% Settings
+
+MODES = ['linear', 'exp']
+
+# Fixed point of the exponential average: codes * 2 ** FRACTION in int32
+FRACTION = 16
+
+#%% Classes
+
+class Average:
+
+    # Averaging of frames with the same settings, e.g. triggered windows
+    # (h0.CaptureTriggered()), in integer arrays of the raw interleaved
+    # layout; volts only on read out. Per sample min / max envelope in uint8.
+    # mode 'linear' - uint32 sums of n frames, then the next n (the last
+    #                 complete average is shown meanwhile), n None - all
+    #                 frames since reset()
+    # mode 'exp'    - exponential averaging with weight 1 / n, n is rounded
+    #                 to a power of two (shift instead of division)
+    # Reads like a Frame (ch, volts, convert, time, t0, dt), so it can be
+    # passed to hantek_decimate.Decimator; frame() makes a real uint8 Frame.
+
+    def __init__(self, n = None, mode = 'linear', envelope = True):
+
+        if mode not in MODES:
+
+            raise ValueError('Mode must be one of %s' % MODES)
+
+        if mode == 'exp' and not n:
+
+            raise ValueError('Exponential averaging needs n')
+
+        self.n = n
+        self.mode = mode
+        self.envelope = envelope
+        self.shift = int(round(np.log2(n))) if mode == 'exp' else 0
+
+        self.reset()
+
+    def reset(self):
+
+        self.key = None
+        self.last = None
+        self.acc = None
+        self.tmp = None
+        self.lo = None
+        self.hi = None
+        self.count = 0
+
+        # Last complete linear average: (sums, count)
+        self.done = None
+
+    def add(self, frame):
+
+        # Returns True when an average of n frames is complete
+        key = (len(frame.raw), frame.samplerate, frame.ChVDiv, frame.cal,
+               frame.channels)
+
+        if key != self.key:
+
+            self.reset()
+
+            self.key = key
+
+        self.last = frame
+
+        raw = frame.raw
+
+        if self.acc is None:
+
+            if self.mode == 'exp':
+
+                self.acc = np.left_shift(raw, FRACTION, dtype = np.int32)
+                self.tmp = np.empty_like(self.acc)
+
+            else:
+
+                self.acc = raw.astype(np.uint32)
+
+            if self.envelope and self.lo is None:
+
+                self.lo = raw.copy()
+                self.hi = raw.copy()
+
+            elif self.envelope:
+
+                np.minimum(self.lo, raw, out = self.lo)
+                np.maximum(self.hi, raw, out = self.hi)
+
+            self.count = 1
+
+        else:
+
+            if self.mode == 'exp':
+
+                # acc += ((x << FRACTION) - acc) >> shift
+                np.left_shift(raw, FRACTION, out = self.tmp, dtype = np.int32)
+                np.subtract(self.tmp, self.acc, out = self.tmp)
+                np.right_shift(self.tmp, self.shift, out = self.tmp)
+                np.add(self.acc, self.tmp, out = self.acc)
+
+            else:
+
+                np.add(self.acc, raw, out = self.acc)
+
+            if self.envelope:
+
+                np.minimum(self.lo, raw, out = self.lo)
+                np.maximum(self.hi, raw, out = self.hi)
+
+            self.count += 1
+
+        if self.mode == 'linear' and self.n and self.count >= self.n:
+
+            self.done = (self.acc, self.count)
+
+            # The next frame starts a new block
+            self.acc = None
+
+            return True
+
+        return False
+
+    def codes(self, i = None):
+
+        # Average in codes, float64: channel i, None - raw interleaved layout
+        if self.mode == 'exp':
+
+            acc, count = self.acc, 1 << FRACTION
+
+        else:
+
+            acc, count = self.done if self.done is not None else (self.acc, self.count)
+
+        if i is not None:
+
+            c = self.last.channels
+
+            acc = acc[i:c * len(self):c]
+
+        return acc / float(count)
+
+    def __len__(self):
+
+        return len(self.last) if self.last is not None else 0
+
+    @property
+    def channels(self):
+
+        return self.last.channels
+
+    @property
+    def t0(self):
+
+        return self.last.t0
+
+    @property
+    def dt(self):
+
+        return self.last.dt
+
+    def ch(self, i):
+
+        # Average of channel i in codes, float64
+        return self.codes(i)
+
+    def convert(self, i, x, dtype = np.float64, out = None):
+
+        return self.last.convert(i, x, dtype, out)
+
+    def volts(self, i, dtype = np.float64, out = None):
+
+        return self.convert(i, self.ch(i), dtype, out)
+
+    def time(self, dtype = np.float64, out = None):
+
+        return self.last.time(dtype, out)
+
+    def min(self, i, dtype = np.float64):
+
+        # Envelope of channel i since the last reset, volts
+        c = self.last.channels
+
+        return self.convert(i, self.lo[i:c * len(self):c], dtype)
+
+    def max(self, i, dtype = np.float64):
+
+        c = self.last.channels
+
+        return self.convert(i, self.hi[i:c * len(self):c], dtype)
+
+    def frame(self):
+
+        # Average rounded to uint8 codes as a Frame
+        raw = np.rint(self.codes()).astype(np.uint8)
+
+        return self.last.sub(raw, self.last.t0)
@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+Created on %(date)s
+
+@author: %(username)s
+"""
+
+import argparse, json, sys, time, tracemalloc
+import numpy as np
+import pyhantek6022BE as pyhantek
+from hantek_sim import HantekSim, SimBus, USB2_BANDWIDTH
+
+#%% Settings
+
+# Samples per channel of the dump the simulator serves
+DUMP_SAMPLES = 1 << 20
+
+#%% Funcs
+
+def waveform(samples = DUMP_SAMPLES):
+
+    # Raw dump of the default simulator signals, generated once: the
+    # simulator only copies it, the float64 waveforms of a source of
+    # functions stay out of the timings and the peak memory
+    return HantekSim().samples(0, samples)
+
+def bench_rate(h0, rate, repeats = 5):
+
+    h0.set_samplerate(rate)
+
+    # GetData latency: start + bulk read + conversion
+    lat = []
+
+    for i in range(repeats):
+
+        t0 = time.perf_counter()
+
+        h0.GetData()
+
+        lat.append(time.perf_counter() - t0)
+
+    # GetData with conversion overlapped with the transfer
+    chunked = []
+
+    for i in range(repeats):
+
+        t0 = time.perf_counter()
+
+        h0.GetDataChunked()
+
+        chunked.append(time.perf_counter() - t0)
+
+    # Conversion only, on the same raw buffer
+    h0.ctrl(0x40, 227, b'\x01', 0, 0x00)
+
+    bread = h0.bread(h0.dictDatLen_N[rate])
+
+    conv = []
+
+    for i in range(repeats):
+
+        t0 = time.perf_counter()
+
+        h0.Convert(bread)
+
+        conv.append(time.perf_counter() - t0)
+
+    # Peak memory of one GetData: the library's buffers and the array pyusb
+    # returns (the simulator must serve a dump, see waveform)
+    tracemalloc.start()
+
+    h0.GetData()
+
+    peak = tracemalloc.get_traced_memory()[1]
+
+    tracemalloc.stop()
+
+    samples = len(bread) // 2
+
+    return {'rate': rate,
+            'samples': samples,
+            'latency_ms': 1000. * float(np.median(lat)),
+            'latency_min_ms': 1000. * min(lat),
+            'chunked_min_ms': 1000. * min(chunked),
+            'convert_msps': samples / min(conv) / 1e6,
+            'peak_mb': peak / 2**20}
+
+def bench(h0, repeats = 5):
+
+    return [bench_rate(h0, rate, repeats)
+            for rate in sorted(h0.dictSR_N.values(), reverse = True)]
+
+def bench_cold(latency = 0.0005, renum_delay = 0.5):
+
+    # Cold start: firmware upload and re-enumeration of the simulated device
+    sim = HantekSim(loaded = False, latency = latency, renum_delay = renum_delay)
+
+    t0 = time.perf_counter()
+
+    h0 = pyhantek.Hantek(find = SimBus(sim).find)
+
+    dt = time.perf_counter() - t0
+
+    h0.close()
+
+    return {'cold_start_s': dt, 'firmware_transfers': sim.transfers[160]}
+
+def report(results):
+
+    print('%12s %10s %12s %12s %14s %14s %10s' % ('rate, S/s', 'samples',
+          'lat, ms', 'lat min, ms', 'chunked, ms', 'convert, MS/s', 'peak, MB'))
+
+    for r in results:
+
+        print('%12d %10d %12.2f %12.2f %14.2f %14.1f %10.1f' % (r['rate'],
+              r['samples'], r['latency_ms'], r['latency_min_ms'],
+              r['chunked_min_ms'], r['convert_msps'], r['peak_mb']))
+
+def compare(results, baseline, tolerance = 0.2):
+
+    # Returns list of regressions against results of a previous run
+    base = {r['rate']: r for r in baseline}
+
+    regressions = []
+
+    for r in results:
+
+        b = base.get(r['rate'])
+
+        if b is None:
+
+            continue
+
+        if r['latency_min_ms'] > b['latency_min_ms'] * (1. + tolerance):
+
+            regressions.append((r['rate'], 'latency_min_ms'))
+
+        if r['convert_msps'] < b['convert_msps'] * (1. - tolerance):
+
+            regressions.append((r['rate'], 'convert_msps'))
+
+        if r['peak_mb'] > b['peak_mb'] * (1. + tolerance):
+
+            regressions.append((r['rate'], 'peak_mb'))
+
+    return regressions
+
+#%% Main
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description = 'Hantek 6022BE capture benchmark')
+
+    parser.add_argument('--repeats', type = int, default = 5)
+    parser.add_argument('--usb2', action = 'store_true',
+                        help = 'emulate USB 2.0 bandwidth')
+    parser.add_argument('--dump', help = 'raw interleaved dump to serve')
+    parser.add_argument('--hardware', action = 'store_true',
+                        help = 'use the real device instead of the simulator')
+    parser.add_argument('--cold', action = 'store_true',
+                        help = 'also measure cold start with firmware upload')
+    parser.add_argument('--save', help = 'write results to json file')
+    parser.add_argument('--baseline', help = 'json file of a previous run')
+    parser.add_argument('--tolerance', type = float, default = 0.2)
+
+    args = parser.parse_args()
+
+    if args.hardware:
+
+        h0 = pyhantek.Hantek()
+
+    else:
+
+        h0 = pyhantek.Hantek(HantekSim(args.dump or waveform(),
+                             bandwidth = USB2_BANDWIDTH if args.usb2 else None))
+
+    results = bench(h0, args.repeats)
+
+    h0.close()
+
+    report(results)
+
+    if args.cold:
+
+        cold = bench_cold()
+
+        print('Cold start: %.3f s, %d firmware transfers' %
+              (cold['cold_start_s'], cold['firmware_transfers']))
+
+    if args.save:
+
+        with open(args.save, 'w') as f:
+
+            json.dump(results, f, indent = 1)
+
+    if args.baseline:
+
+        with open(args.baseline) as f:
+
+            regressions = compare(results, json.load(f), args.tolerance)
+
+        for rate, key in regressions:
+
+            print('Regression at %d S/s: %s' % (rate, key))
+
+        sys.exit(1 if regressions else 0)
+
+#%% End
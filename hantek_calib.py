@@ -0,0 +1,185 @@
+import json, os
+import numpy as np
+
+from pyhantek6022BE import VDIV_N, nominal_cal
+
+#%% Settings
+
+CALIB_FILE = os.path.join(os.path.expanduser('~'), '.hantek6022BE_calibration.json')
+
+# Plausible gain errors: a measured gain outside is a wrong reference or a
+# clipped input, not the front end
+GAIN_RANGE = (0.8, 1.25)
+
+#%% Classes
+
+class Calibration:
+
+    # Offset (codes) and gain error of each channel and V / DIV range:
+    # volts = (x - 128 - offset) / 255 * 10 * VDiv * gain
+    # Coefficients are cached per (channel, VDiv), Frame.lut builds the LUTs.
+
+    def __init__(self, serial = None):
+
+        self.serial = serial or 'default'
+        self.offset = {}
+        self.gain = {}
+        self.cache = {}
+
+    def set(self, ch, vdiv, offset = None, gain = None):
+
+        if offset is not None:
+
+            self.offset[(ch, vdiv)] = float(offset)
+
+        if gain is not None:
+
+            self.gain[(ch, vdiv)] = float(gain)
+
+        self.cache.clear()
+
+    def coeffs(self, ch, vdiv):
+
+        # (zero code, volts per code), see pyhantek6022BE.Frame
+        key = (ch, vdiv)
+
+        if key not in self.cache:
+
+            zero, scale = nominal_cal(vdiv)
+
+            self.cache[key] = (zero + self.offset.get(key, 0.),
+                               scale * self.gain.get(key, 1.))
+
+        return self.cache[key]
+
+    def to_dict(self):
+
+        out = {}
+
+        for (ch, vdiv) in set(self.offset) | set(self.gain):
+
+            out.setdefault('Ch%d' % (ch + 1), {})[str(vdiv)] = {
+                'offset': self.offset.get((ch, vdiv), 0.),
+                'gain': self.gain.get((ch, vdiv), 1.)}
+
+        return out
+
+    def save(self, path = CALIB_FILE):
+
+        # All devices share one file, keyed by serial
+        data = {}
+
+        if os.path.exists(path):
+
+            with open(path) as f:
+
+                data = json.load(f)
+
+        data[self.serial] = self.to_dict()
+
+        with open(path, 'w') as f:
+
+            json.dump(data, f, indent = 1, sort_keys = True)
+
+        print('Calibration of', self.serial, 'is saved to', path)
+
+    @classmethod
+    def load(cls, serial = None, path = CALIB_FILE):
+
+        # Empty (nominal) calibration if the device is not in the file
+        cal = cls(serial)
+
+        if not os.path.exists(path):
+
+            return cal
+
+        with open(path) as f:
+
+            entry = json.load(f).get(cal.serial, {})
+
+        for name, ranges in entry.items():
+
+            for vdiv, v in ranges.items():
+
+                vdiv = float(vdiv)
+
+                if vdiv not in VDIV_N.values():
+
+                    continue
+
+                cal.set(int(name[2:]) - 1, vdiv, v['offset'], v['gain'])
+
+        return cal
+
+#%% Funcs
+
+def mean_codes(h0, captures = 4):
+
+    # Mean raw code of every channel over several captures
+    sums = 0.
+
+    for k in range(captures):
+
+        frame = h0.Capture()
+
+        sums = sums + np.array([frame.ch(i).mean() for i in range(frame.channels)])
+
+    return sums / captures
+
+def calibrate(h0, ranges = None, references = None, captures = 4, ask = input):
+
+    # Guided calibration of the channels (h0.channels) for every V / DIV
+    # range: offset with grounded inputs, then gain with a DC reference on
+    # the inputs, 3 divisions by default. Gains outside GAIN_RANGE are not
+    # taken. references - {VDiv: volts}
+    ranges = ranges or list(h0.dictN_VDiv)
+    references = references or {}
+
+    ChVDiv = list(h0.ChVDiv)
+
+    cal = Calibration(h0.serial())
+
+    ask('Connect the inputs to ground and press Enter')
+
+    for v in ranges:
+
+        h0.set_chvdiv([v, v])
+
+        for ch, m in enumerate(mean_codes(h0, captures)):
+
+            cal.set(ch, v, offset = m - 128.)
+
+    for v in ranges:
+
+        ref = references.get(v, 3. * v)
+
+        ask('Apply %g V DC to the inputs and press Enter' % ref)
+
+        h0.set_chvdiv([v, v])
+
+        for ch, m in enumerate(mean_codes(h0, captures)):
+
+            zero, scale = cal.coeffs(ch, v)
+
+            if m == zero:
+
+                print('No signal on Ch%d at %g V / DIV, gain is not changed' % (ch + 1, v))
+
+                continue
+
+            gain = ref / ((m - zero) * scale)
+
+            if not GAIN_RANGE[0] <= gain <= GAIN_RANGE[1]:
+
+                print('Gain %.3f of Ch%d at %g V / DIV is implausible (reference, clipping?), '
+                      'gain is not changed' % (gain, ch + 1, v))
+
+                continue
+
+            cal.set(ch, v, gain = gain)
+
+    h0.set_chvdiv(ChVDiv)
+
+    h0.set_calibration(cal)
+
+    return cal
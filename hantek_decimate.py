@@ -0,0 +1,120 @@
+import numpy as np
+
+#%% Settings
+
+METHODS = ['minmax', 'lttb']
+
+#%% Funcs
+
+def minmax(y, n):
+
+    # Indices of the min and max of each of n buckets, in time order, so the
+    # drawn line keeps every peak. 2 * n points at most.
+    N = len(y)
+    m = -(-N // n)
+
+    if m < 2:
+
+        return np.arange(N)
+
+    k = N // m
+    yb = y[:k * m].reshape(k, m)
+
+    imin = yb.argmin(axis = 1)
+    imax = yb.argmax(axis = 1)
+
+    base = np.arange(k) * m
+
+    idx = np.empty(2 * k, dtype = np.intp)
+    idx[0::2] = base + np.minimum(imin, imax)
+    idx[1::2] = base + np.maximum(imin, imax)
+
+    if k * m < N:
+
+        # Last incomplete bucket
+        tail = y[k * m:]
+        lo, hi = sorted((int(tail.argmin()), int(tail.argmax())))
+
+        idx = np.r_[idx, k * m + lo, k * m + hi]
+
+    return idx
+
+def lttb(y, n):
+
+    # Largest-Triangle-Three-Buckets, n points. The left point of each
+    # triangle is the average of the previous bucket instead of the point
+    # selected there, so all buckets are computed at once.
+    N = len(y)
+
+    if n >= N or n < 3:
+
+        return np.arange(N)
+
+    m = (N - 2) // (n - 2)
+
+    xs = 1 + np.arange((n - 2) * m).reshape(n - 2, m)
+    ys = y[1:1 + (n - 2) * m].reshape(n - 2, m).astype(np.float64)
+
+    avg_x = xs.mean(axis = 1)
+    avg_y = ys.mean(axis = 1)
+
+    ax = np.r_[0., avg_x[:-1]][:, None]
+    ay = np.r_[float(y[0]), avg_y[:-1]][:, None]
+    cx = np.r_[avg_x[1:], N - 1.][:, None]
+    cy = np.r_[avg_y[1:], float(y[-1])][:, None]
+
+    area = np.abs((ax - cx) * (ys - ay) - (ax - xs) * (cy - ay))
+
+    sel = xs[np.arange(n - 2), area.argmax(axis = 1)]
+
+    return np.r_[0, sel, N - 1]
+
+def follow(t_range, last, frame):
+
+    # Visible time range (s) for frame after a frame at t0 last: moved with
+    # t0, so the view keeps its place in the frames of a Stream (t0
+    # advances every frame); captures keep their t0 and the zoom stays
+    shift = frame.t0 - last
+
+    return t_range[0] + shift, t_range[1] + shift
+
+#%% Classes
+
+class Decimator:
+
+    # Display decimation of a Frame: picks about width points of the visible
+    # time range from the raw uint8 samples and converts only those to volts.
+
+    def __init__(self, method = 'minmax', dtype = np.float64):
+
+        if method not in METHODS:
+
+            raise ValueError('Method must be one of %s' % METHODS)
+
+        self.method = method
+        self.dtype = dtype
+
+    def __call__(self, frame, i, width, t_range = None):
+
+        # Returns (t, volts) of channel i, t_range - (t_start, t_stop), s
+        n = len(frame)
+        a, b = 0, n
+
+        if t_range is not None:
+
+            a = min(max(int((t_range[0] - frame.t0) / frame.dt), 0), n)
+            b = min(max(int(np.ceil((t_range[1] - frame.t0) / frame.dt)) + 1, a), n)
+
+        x = frame.ch(i)[a:b]
+
+        if self.method == 'lttb':
+
+            idx = lttb(x, width)
+
+        else:
+
+            idx = minmax(x, max(width // 2, 1))
+
+        t = frame.t0 + (a + idx) * frame.dt
+
+        return t, frame.convert(i, x[idx], self.dtype)
@@ -0,0 +1,435 @@
+import numpy as np
+from hantek_measure import entries
+
+#%% Settings
+
+# Decoded symbol: time of its first sample (s), kind, value, flags
+SYMBOL = np.dtype([('t', '<f8'), ('kind', 'u1'), ('value', '<u2'), ('flags', 'u1')])
+
+# kind
+DATA = 0
+ADDRESS = 1 # I2C: the first byte after START, value >> 1 - address, value & 1 - read
+START = 2
+STOP = 3
+
+# flags
+PARITY_ERROR = 1
+FRAME_ERROR = 2 # UART: stop bit low, SPI / I2C: word cut by a pause / condition
+NACK = 4
+
+PARITY = [None, 'even', 'odd']
+
+# Logic thresholds, V (TTL)
+LOW = 0.8
+HIGH = 2.0
+
+#%% Funcs
+
+def edges(x, low, high, level = None):
+
+    # Edges of raw codes x with hysteresis: >= high is 1, <= low is 0, in
+    # between the level stays. level - before x, None - unknown (the first
+    # level is not an edge). Returns (positions, new levels, level at the end).
+    # Only the entries into the two regions are sorted, not every sample.
+    r = entries((x >= high)[None])
+    f = entries((x <= low)[None])
+
+    pos = np.concatenate((r, f))
+    val = np.zeros(len(pos), dtype = bool)
+    val[:len(r)] = True
+
+    if len(pos) == 0:
+
+        return pos, val, level
+
+    order = np.argsort(pos, kind = 'stable')
+
+    pos = pos[order]
+    val = val[order]
+
+    change = np.empty(len(val), dtype = bool)
+    change[0] = level is not None and val[0] != level
+
+    np.not_equal(val[1:], val[:-1], out = change[1:])
+
+    return pos[change], val[change], bool(val[-1])
+
+def symbols(t, kind, value, flags = 0):
+
+    out = np.empty(len(t), dtype = SYMBOL)
+
+    out['t'] = t
+    out['kind'] = kind
+    out['value'] = value
+    out['flags'] = flags
+
+    return out
+
+#%% Classes
+
+class Decoder:
+
+    # Base of the decoders. feed(frame) thresholds the channels of the frame
+    # with hysteresis (low / high, V) into edges at absolute sample positions
+    # and returns the symbols decoded so far as a SYMBOL array. Edges of a
+    # symbol cut by the end of the frame are kept for the next frame, so
+    # frames of a Stream decode as one signal; a frame that doesn't continue
+    # the previous one (t0, sample rate) starts anew.
+    # Subclasses implement decode() -> (symbols, keep): edges before keep are
+    # not needed any more.
+
+    def __init__(self, channels, low = LOW, high = HIGH):
+
+        if low >= high:
+
+            raise ValueError('Low threshold must be below high')
+
+        self.channels = channels
+        self.low = low
+        self.high = high
+
+        self.reset()
+
+    def reset(self):
+
+        k = len(self.channels)
+
+        # Edges: positions since origin and new levels, level at the end
+        self.pos = [np.empty(0, dtype = np.intp) for i in range(k)]
+        self.val = [np.empty(0, dtype = bool) for i in range(k)]
+        self.last = [None] * k
+
+        # Samples so far, time of sample 0
+        self.end = 0
+        self.origin = None
+        self.next_t0 = None
+        self.samplerate = None
+        self.dt = None
+
+    def thresholds(self, frame, ch):
+
+        # Thresholds in codes of the channel, at least one code apart
+        zero, scale = frame.cal[ch]
+
+        lo = int(np.floor(self.low / scale + zero))
+        hi = int(np.ceil(self.high / scale + zero))
+
+        return min(lo, hi - 1), hi
+
+    def feed(self, frame):
+
+        if frame.samplerate != self.samplerate or not frame.follows(self.next_t0):
+
+            self.reset()
+
+            self.origin = frame.t0
+            self.samplerate = frame.samplerate
+            self.dt = frame.dt
+
+        self.next_t0 = frame.t0 + len(frame) * frame.dt
+
+        for k, c in enumerate(self.channels):
+
+            p, v, self.last[k] = edges(frame.ch(c), *self.thresholds(frame, c),
+                                       level = self.last[k])
+
+            self.pos[k] = np.concatenate((self.pos[k], p + self.end))
+            self.val[k] = np.concatenate((self.val[k], v))
+
+        self.end += len(frame)
+
+        out, keep = self.decode()
+
+        for k in range(len(self.channels)):
+
+            i = np.searchsorted(self.pos[k], keep)
+
+            self.pos[k] = self.pos[k][i:]
+            self.val[k] = self.val[k][i:]
+
+        return out
+
+    def level(self, k, p):
+
+        # Levels of channel k at sample positions p
+        pos, val = self.pos[k], self.val[k]
+
+        if len(pos) == 0:
+
+            return np.full(np.shape(p), bool(self.last[k]))
+
+        i = np.searchsorted(pos, p, 'right') - 1
+
+        # Before the first edge: the opposite of it
+        return np.where(i >= 0, val[np.maximum(i, 0)], not val[0])
+
+    def time(self, p):
+
+        return self.origin + p * self.dt
+
+    def decode(self):
+
+        raise NotImplementedError
+
+class UART(Decoder):
+
+    # Idle high, LSB first: start bit, bits, parity (None, 'even', 'odd'),
+    # stop bits. Bits are read in the middle of their nominal time from the
+    # falling edge of the start bit.
+
+    def __init__(self, baud, ch = 0, bits = 8, parity = None, stop = 1,
+                 low = LOW, high = HIGH):
+
+        if parity not in PARITY:
+
+            raise ValueError('Parity must be one of %s' % PARITY)
+
+        self.baud = baud
+        self.bits = bits
+        self.parity = parity
+        self.stop = stop
+
+        super().__init__([ch], low, high)
+
+    def decode(self):
+
+        pos, val = self.pos[0], self.val[0]
+
+        spb = self.samplerate / self.baud
+        nbits = 1 + self.bits + (self.parity is not None) + self.stop
+
+        falls = pos[~val]
+
+        # Middle of the last stop bit of a character from every falling edge
+        last = falls + int((nbits - 0.5) * spb)
+
+        # Next candidate after every falling edge: the first edge after the
+        # character or, for a glitch (the start bit is over before its
+        # middle), the next edge
+        glitch = self.level(0, falls + int(0.5 * spb))
+
+        nxt = np.where(glitch, np.arange(1, len(falls) + 1),
+                       np.searchsorted(falls, last)).tolist()
+
+        complete = (last < self.end).tolist()
+        glitch = glitch.tolist()
+
+        # Only the chain of starts is followed one by one: a falling edge
+        # inside a character is not a start
+        keep = self.end
+        starts = []
+
+        i = 0
+
+        while i < len(falls):
+
+            if not complete[i]:
+
+                keep = falls[i]
+
+                break
+
+            if not glitch[i]:
+
+                starts.append(falls[i])
+
+            i = nxt[i]
+
+        s = np.array(starts, dtype = np.intp)
+
+        # Middles of all bits after the start bit of every character
+        mid = s[:, None] + ((np.arange(1, nbits) + 0.5) * spb).astype(np.intp)
+
+        b = self.level(0, mid)
+
+        data = b[:, :self.bits]
+
+        value = data.astype(np.uint16) @ (1 << np.arange(self.bits, dtype = np.uint16))
+
+        flags = np.where(b[:, nbits - 1 - self.stop:].all(axis = 1), 0, FRAME_ERROR)
+
+        if self.parity is not None:
+
+            ones = data.sum(axis = 1) + b[:, self.bits]
+
+            bad = ones % 2 != (self.parity == 'odd')
+
+            flags = flags | np.where(bad, PARITY_ERROR, 0)
+
+        return symbols(self.time(s), DATA, value, flags), keep
+
+class SPI(Decoder):
+
+    # Clock and data without chip select (two channels): data is read at
+    # the sampling clock edge of mode (0 - 3), bits per word, MSB first if
+    # msb. A pause longer than timeout (s) between clock edges starts a new
+    # word, an incomplete word before it gets FRAME_ERROR; timeout None -
+    # words just follow each other.
+
+    def __init__(self, clk = 0, data = 1, mode = 0, bits = 8, msb = True,
+                 timeout = None, low = LOW, high = HIGH):
+
+        if mode not in range(4):
+
+            raise ValueError('Mode must be 0 - 3')
+
+        # CPOL == CPHA: rising edge
+        self.rising = (mode >> 1) == (mode & 1)
+        self.bits = bits
+        self.msb = msb
+        self.timeout = timeout
+
+        super().__init__([clk, data], low, high)
+
+    def decode(self):
+
+        clk = self.pos[0][self.val[0] == self.rising]
+
+        if len(clk) == 0:
+
+            return symbols([], DATA, 0), self.end
+
+        bit = self.level(1, clk)
+
+        # New word: the first edge (the cut word is kept from its start),
+        # after a pause, then every bits edges
+        new = np.zeros(len(clk), dtype = bool)
+        new[0] = True
+
+        timeout = None if self.timeout is None else self.timeout * self.samplerate
+
+        if timeout is not None:
+
+            new[1:] = np.diff(clk) > timeout
+
+        first = np.flatnonzero(new)
+
+        k = np.arange(len(clk)) - first[np.cumsum(new) - 1]
+        k %= self.bits
+
+        word = np.cumsum(k == 0) - 1
+        count = np.bincount(word)
+
+        shift = self.bits - 1 - k if self.msb else k
+
+        value = np.bincount(word, weights = bit << shift).astype(np.uint16)
+
+        flags = np.where(count < self.bits, FRAME_ERROR, 0)
+
+        t = clk[k == 0]
+
+        keep = self.end
+
+        # The last word may continue in the next frame
+        if count[-1] < self.bits and (timeout is None or self.end - clk[-1] <= timeout):
+
+            keep = t[-1]
+
+            t, value, flags = t[:-1], value[:-1], flags[:-1]
+
+        return symbols(self.time(t), DATA, value, flags), keep
+
+class I2C(Decoder):
+
+    # SCL and SDA: START / STOP (SDA falls / rises while SCL is high) and
+    # bytes of 8 bits + ACK read at the rising edges of SCL. The first byte
+    # after START is ADDRESS, NACK in flags; a byte cut by a condition gets
+    # FRAME_ERROR.
+
+    def __init__(self, scl = 0, sda = 1, low = LOW, high = HIGH):
+
+        super().__init__([scl, sda], low, high)
+
+    def reset(self):
+
+        super().reset()
+
+        # The kept byte is an address
+        self.address = False
+
+    def decode(self):
+
+        clk = self.pos[0][self.val[0]]
+        bit = self.level(1, clk)
+
+        # Conditions: SCL high before and at the SDA edge
+        sda, rise = self.pos[1], self.val[1]
+
+        cond = self.level(0, sda - 1) & self.level(0, sda)
+
+        cpos = sda[cond]
+        ckind = np.where(rise[cond], STOP, START)
+
+        # All events in time order, a condition before a bit at the same sample
+        pos = np.concatenate((cpos, clk))
+        is_cond = np.zeros(len(pos), dtype = bool)
+        is_cond[:len(cpos)] = True
+
+        order = np.argsort(pos, kind = 'stable')
+
+        pos = pos[order]
+        is_cond = is_cond[order]
+
+        # Bits so far at every event, at the last condition, ordinal of a bit
+        # since the last condition
+        nb = np.cumsum(~is_cond)
+        base = np.maximum.accumulate(np.where(is_cond, nb, 0))
+
+        k = (nb - base - 1)[~is_cond]
+
+        # Segment of every bit: after which condition (-1 - before all)
+        seg = (np.cumsum(is_cond) - 1)[~is_cond]
+
+        kb = k % 9
+
+        byte = np.cumsum(kb == 0) - 1
+        count = np.bincount(byte, minlength = 0)
+
+        data = kb < 8
+
+        value = np.bincount(byte[data], weights = bit[data] << (7 - kb[data]),
+                            minlength = len(count)).astype(np.uint16)
+
+        # ACK bit: high - NACK
+        nack = np.zeros(len(count), dtype = bool)
+        nack[byte[kb == 8]] = bit[kb == 8]
+
+        # Byte 0 after START or of the kept address
+        head = k[kb == 0] == 0
+        bseg = seg[kb == 0]
+
+        # -1 - the kept state
+        after_start = np.append(ckind == START, self.address)[bseg]
+
+        kind = np.where(head & after_start, ADDRESS, DATA)
+
+        flags = np.where(nack, NACK, 0) | np.where(count < 9, FRAME_ERROR, 0)
+
+        t = clk[kb == 0]
+
+        keep = self.end
+
+        # A cut byte with no condition after it continues in the next frame
+        if len(count) and count[-1] < 9 and (len(cpos) == 0 or cpos[-1] < t[-1]):
+
+            keep = t[-1]
+
+            self.address = bool(kind[-1] == ADDRESS)
+
+            t, kind, value, flags, count = t[:-1], kind[:-1], value[:-1], flags[:-1], count[:-1]
+
+        else:
+
+            # START as the last event: the next byte is an address
+            self.address = bool(len(pos) and is_cond[-1] and ckind[-1] == START)
+
+        # A single clock before a condition sets up a repeated START or a
+        # STOP, it is not a byte
+        real = count > 1
+
+        t, kind, value, flags = t[real], kind[real], value[real], flags[real]
+
+        out = np.concatenate((symbols(self.time(cpos), ckind, 0),
+                              symbols(self.time(t), kind, value, flags)))
+
+        return out[np.argsort(out['t'], kind = 'stable')], keep
@@ -0,0 +1,345 @@
+import copy
+import numpy as np
+from pyhantek6022BE import Frame
+
+try:
+
+    from scipy import signal
+
+except ImportError:
+
+    # IIR filters need scipy, FIR and CIC don't
+    signal = None
+
+#%% Settings
+
+# Output codes: (code - 128) * 2 ** FRACTION in int16, 8 bits below the ADC LSB
+FRACTION = 8
+
+# Input samples per processing step: bounds the work buffers
+CHUNK = 1 << 16
+
+#%% Funcs
+
+def lowpass(ntaps, cutoff, window = 'blackman'):
+
+    # Windowed sinc FIR low pass, cutoff - part of the sample rate (< 0.5),
+    # gain 1 at DC
+    n = np.arange(ntaps) - (ntaps - 1) / 2.
+
+    h = np.sinc(2. * cutoff * n) * getattr(np, window)(ntaps)
+
+    return h / h.sum()
+
+def cic_response(f, R, N):
+
+    # Magnitude of a CIC decimator (gain normalized) at f, part of the
+    # output sample rate
+    f = np.asarray(f, dtype = np.float64)
+
+    num = np.sin(np.pi * f)
+    den = R * np.sin(np.pi * f / R)
+
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+
+        h = np.where(f == 0, 1., num / den)
+
+    return np.abs(h) ** N
+
+def compensator(ntaps, R, N, cutoff = 0.25, window = 'blackman', grid = 1024):
+
+    # FIR after a CIC decimator (R, N): inverse of the CIC droop up to
+    # cutoff, zero above, cutoff - part of the CIC output rate. Frequency
+    # sampling on grid points, windowed.
+    f = np.linspace(0., 0.5, grid + 1)
+
+    H = np.where(f <= cutoff, 1. / cic_response(f, R, N), 0.)
+
+    h = np.fft.irfft(H, 2 * grid)
+
+    h = np.roll(h, ntaps // 2)[:ntaps] * getattr(np, window)(ntaps)
+
+    return h / h.sum()
+
+def chain(decim, N = 4, fir_decim = 4, ntaps = 48, cutoff = 0.2):
+
+    # CIC by decim / fir_decim, then the compensating FIR low pass by
+    # fir_decim: pass band up to cutoff of the output rate, flat
+    R = decim // fir_decim
+
+    if R * fir_decim != decim:
+
+        raise ValueError('Decimation must be a multiple of fir_decim')
+
+    if R == 1:
+
+        return [FIR(lowpass(ntaps, cutoff / fir_decim), fir_decim)]
+
+    taps = compensator(ntaps, R, N, cutoff / fir_decim)
+
+    return [CIC(R, N), FIR(taps, fir_decim)]
+
+#%% Classes
+
+class Stage:
+
+    # Streaming stage: process(x) takes the next input samples, returns the
+    # outputs ready so far; the output for input n (counted from reset())
+    # comes when n % decim == decim - 1, so stages chain and frames may be
+    # cut anywhere. delay - group delay at low frequencies, input samples:
+    # that output shows the signal of input n - delay.
+
+    decim = 1
+    delay = 0.
+
+    def reset(self):
+
+        # Inputs to skip before the next output
+        self.skip = self.decim - 1
+
+    def pick(self, y):
+
+        # Every decim-th of y, the phase carried to the next call
+        out = y[self.skip::self.decim]
+
+        self.skip = (self.skip - len(y)) % self.decim
+
+        return out
+
+class FIR(Stage):
+
+    # FIR filter taps, decimation by decim: only the kept outputs are
+    # computed (sliding windows of the input times taps).
+
+    def __init__(self, taps, decim = 1):
+
+        self.taps = np.asarray(taps, dtype = np.float64)
+        self.decim = decim
+
+        # Reversed: windows @ rev is the convolution
+        self.rev = self.taps[::-1].copy()
+
+        # Centroid of the taps: the group delay at DC
+        self.delay = float(np.arange(len(self.taps)) @ self.taps / self.taps.sum())
+
+        self.reset()
+
+    def reset(self):
+
+        super().reset()
+
+        self.hist = np.zeros(len(self.taps) - 1)
+
+    def process(self, x):
+
+        buf = np.concatenate((self.hist, x))
+
+        k = len(self.taps) - 1
+
+        self.hist = buf[len(buf) - k:]
+
+        w = np.lib.stride_tricks.sliding_window_view(buf, len(self.taps))
+
+        return self.pick(w) @ self.rev
+
+class CIC(Stage):
+
+    # Cascaded integrator comb decimator: N integrators at the input rate,
+    # decimation by R, N combs (delay 1) at the output rate, in int64 (the
+    # integrators wrap around, the combs undo it). Integer input; output
+    # divided by the gain R ** N, float64.
+
+    def __init__(self, R, N = 3):
+
+        self.decim = R
+        self.N = N
+        self.gain = float(R) ** N
+
+        # N moving sums of R samples
+        self.delay = N * (R - 1) / 2.
+
+        self.reset()
+
+    def reset(self):
+
+        super().reset()
+
+        self.acc = np.zeros(self.N, dtype = np.int64)
+        self.prev = np.zeros(self.N, dtype = np.int64)
+
+    def process(self, x):
+
+        y = np.array(x, dtype = np.int64)
+
+        for k in range(self.N):
+
+            np.cumsum(y, out = y)
+
+            y += self.acc[k]
+
+            if len(y):
+
+                self.acc[k] = y[-1]
+
+        y = self.pick(y)
+
+        for k in range(self.N):
+
+            if len(y):
+
+                last = y[-1]
+
+                y = np.diff(y, prepend = self.prev[k])
+
+                self.prev[k] = last
+
+        return y / self.gain
+
+class IIR(Stage):
+
+    # IIR filter of second order sections sos (scipy.signal.butter(...,
+    # output = 'sos') etc.), state kept between calls, then decimation by
+    # decim. Needs scipy.
+
+    def __init__(self, sos, decim = 1):
+
+        if signal is None:
+
+            raise ImportError('IIR filters need scipy')
+
+        self.sos = np.asarray(sos, dtype = np.float64)
+        self.decim = decim
+
+        # Group delay at DC, the sum over the sections
+        self.delay = float(sum(signal.group_delay((s[:3], s[3:]), [0.])[1][0]
+                               for s in self.sos))
+
+        self.reset()
+
+    @classmethod
+    def lowpass(cls, order, cutoff, decim = 1):
+
+        # Butterworth, cutoff - part of the sample rate (< 0.5)
+        if signal is None:
+
+            raise ImportError('IIR filters need scipy')
+
+        return cls(signal.butter(order, 2. * cutoff, output = 'sos'), decim)
+
+    def reset(self):
+
+        super().reset()
+
+        self.zi = np.zeros((len(self.sos), 2))
+
+    def process(self, x):
+
+        y, self.zi = signal.sosfilt(self.sos, x, zi = self.zi)
+
+        return self.pick(y)
+
+class Oversampler:
+
+    # Streaming DSP of stream frames: the stages (CIC, FIR, IIR) in order
+    # for every channel, state kept across frames. feed(frame) returns a
+    # Frame at samplerate / decimation with int16 codes of FRACTION bits
+    # below the ADC LSB (cal adjusted, so volts() / Recorder / viewer work
+    # as with raw frames), None if no output is ready yet. A frame that
+    # doesn't continue the previous one (t0, settings) starts anew, so feed
+    # it the frames of a Stream: independent captures would each start with
+    # the filters settling from mid scale. t0 of the output is corrected by
+    # the group delay of the stages (delay, input samples).
+    #
+    # ov = Oversampler(chain(160))    # 16 MS/s -> 100 kS/s, ~4 bits more
+
+    def __init__(self, stages):
+
+        self.stages = stages
+        self.decim = int(np.prod([s.decim for s in stages]))
+
+        # Delays of later stages are in samples of their slower input
+        self.delay = sum(s.delay * np.prod([p.decim for p in stages[:k]], dtype = int)
+                         for k, s in enumerate(stages))
+
+        self.reset()
+
+    def reset(self):
+
+        self.key = None
+        self.next_t0 = None
+
+        # Stages of every channel, inputs so far
+        self.chains = []
+        self.pos = 0
+
+    def feed(self, frame, out = None):
+
+        # out - int16 buffer for the output, allocated if None or too small
+        key = (frame.samplerate, frame.ChVDiv, frame.cal, frame.channels)
+
+        if key != self.key or not frame.follows(self.next_t0):
+
+            self.reset()
+
+            self.key = key
+            self.origin = frame.t0
+            self.chains = [copy.deepcopy(self.stages) for i in range(frame.channels)]
+
+            for stages in self.chains:
+
+                for s in stages:
+
+                    s.reset()
+
+        self.next_t0 = frame.t0 + len(frame) * frame.dt
+
+        c = frame.channels
+        n = len(frame)
+        D = self.decim
+
+        # Output j is at input j * D + D - 1
+        first = (self.pos + 1) // D
+        m = (self.pos + n + 1) // D - first
+
+        self.pos += n
+
+        if out is None or len(out) < c * m:
+
+            out = np.empty(c * m, dtype = np.int16)
+
+        raw = out[:c * m]
+
+        for i, stages in enumerate(self.chains):
+
+            x = frame.ch(i)
+            y_out = raw[i::c]
+
+            k = 0
+
+            for a in range(0, n, CHUNK):
+
+                # Centered codes: zero history is mid scale
+                y = x[a:a + CHUNK].astype(np.int64) - 128
+
+                for s in stages:
+
+                    y = s.process(y)
+
+                y *= 2 ** FRACTION
+
+                np.clip(np.rint(y), -32768, 32767, out = y)
+
+                y_out[k:k + len(y)] = y
+
+                k += len(y)
+
+        if m == 0:
+
+            return None
+
+        scale = 2 ** FRACTION
+
+        cal = [((zero - 128.) * scale, volts / scale) for zero, volts in frame.cal]
+
+        return Frame(raw, frame.samplerate / D, frame.ChVDiv,
+                     self.origin + (first * D + D - 1 - self.delay) * frame.dt, cal, c)
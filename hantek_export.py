@@ -0,0 +1,247 @@
+import wave, zipfile
+import numpy as np
+from pyhantek6022BE import Frame
+from hantek_record import Recording
+
+#%% Settings
+
+# Samples per channel in memory at a time
+CHUNK = 1 << 16
+
+# Decimals of volts in CSV
+DECIMALS = 6
+
+# zlib level of NPZ: 1 is several times faster than the default for a few
+# percent in size
+COMPRESSLEVEL = 1
+
+# Largest data chunk of a WAV file (32 bit sizes)
+WAV_LIMIT = 0xFFFFFFFF - 36
+
+#%% Funcs
+
+def frames(source):
+
+    # Frames of a source: Frame, list of Frames or hantek_record.Recording
+    if isinstance(source, Frame):
+
+        return [source]
+
+    if isinstance(source, Recording):
+
+        return (source.frame(k) for k in range(len(source.index)))
+
+    return source
+
+def total(source):
+
+    # Samples per channel
+    if isinstance(source, (Frame, Recording)):
+
+        return len(source)
+
+    return sum(len(f) for f in source)
+
+def pieces(source, chunk = CHUNK, progress = None, passes = 1, done = 0):
+
+    # (frame index, Frame of at most chunk samples) over the whole source,
+    # progress(samples done, samples in all passes) after every piece
+    n = total(source) * passes
+
+    for k, f in enumerate(frames(source)):
+
+        for a in range(0, len(f), chunk):
+
+            piece = f.window(a, min(a + chunk, len(f)))
+
+            yield k, piece
+
+            done += len(piece)
+
+            if progress is not None:
+
+                progress(done, n)
+
+def fixed(x, decimals):
+
+    # ASCII of x with decimals, vectorized: (n, width) uint8, 0 - no
+    # character (leading zeros, + sign), removed when the rows are joined
+    q = np.rint(np.abs(x) * 10. ** decimals).astype(np.int64)
+
+    whole = int(q.max()) // 10 ** decimals if len(q) else 0
+
+    nd = len(str(whole))
+
+    p = 10 ** np.arange(nd + decimals - 1, -1, -1, dtype = np.int64)
+
+    digits = (q[:, None] // p % 10 + ord('0')).astype(np.uint8)
+
+    # Leading zeros of the integer part, the units digit stays
+    digits[:, :nd - 1][q[:, None] < p[:nd - 1]] = 0
+
+    out = np.zeros((len(q), 1 + nd + bool(decimals) + decimals), dtype = np.uint8)
+
+    out[:, 0] = np.where((x < 0) & (q > 0), ord('-'), 0)
+    out[:, 1:1 + nd] = digits[:, :nd]
+
+    if decimals:
+
+        out[:, 1 + nd] = ord('.')
+        out[:, 2 + nd:] = digits[:, nd:]
+
+    return out
+
+def rows(columns):
+
+    # CSV lines of the columns (uint8 matrices of fixed()) as bytes
+    n = len(columns[0])
+
+    sep = np.full((n, 1), ord(','), dtype = np.uint8)
+    end = np.full((n, 1), ord('\n'), dtype = np.uint8)
+
+    parts = []
+
+    for c in columns:
+
+        parts += [c, sep]
+
+    parts[-1] = end
+
+    m = np.concatenate(parts, axis = 1)
+
+    return m[m != 0].tobytes()
+
+def to_csv(source, path, decimals = DECIMALS, time_decimals = None,
+           chunk = CHUNK, progress = None):
+
+    # t, Ch1, Ch2 in volts, one row per sample. Numbers are formatted as
+    # fixed point digits with NumPy, not row by row. time_decimals - None:
+    # enough for the sample interval.
+    with open(path, 'wb') as f:
+
+        channels = None
+
+        for k, piece in pieces(source, chunk, progress):
+
+            if channels is None:
+
+                channels = piece.channels
+
+                f.write((','.join(['t (s)'] + ['Ch%d (V)' % (i + 1) for i in range(channels)])
+                         + '\n').encode())
+
+                if time_decimals is None:
+
+                    time_decimals = max(int(np.ceil(-np.log10(piece.dt))) + 1, 0)
+
+            elif piece.channels != channels:
+
+                raise ValueError('Channels change within the source')
+
+            columns = [fixed(piece.time(), time_decimals)]
+
+            columns += [fixed(piece.volts(i), decimals) for i in range(channels)]
+
+            f.write(rows(columns))
+
+def to_wav(source, path, chunk = CHUNK, progress = None):
+
+    # Interleaved channels straight from the raw data: 8 bit PCM is
+    # unsigned with 128 as zero, like the ADC codes (16 bit for the int16
+    # frames of hantek_dsp). The sample rate is the WAV frame rate; V / DIV
+    # and calibration are not kept, the codes are.
+    first = next(iter(frames(source)))
+
+    c = first.channels
+    width = first.raw.dtype.itemsize
+
+    if total(source) * c * width > WAV_LIMIT:
+
+        raise ValueError('WAV is limited to 4 GB, use to_npz')
+
+    with wave.open(path, 'wb') as w:
+
+        w.setnchannels(c)
+        w.setsampwidth(width)
+        w.setframerate(int(round(first.samplerate)))
+
+        for k, piece in pieces(source, chunk, progress):
+
+            if (piece.channels, piece.raw.dtype.itemsize, piece.samplerate) != \
+               (c, width, first.samplerate):
+
+                raise ValueError('Settings change within the source')
+
+            w.writeframesraw(piece.raw[:c * len(piece)])
+
+def npy_member(zf, name, dtype, n):
+
+    # Writable member <name>.npy of an (n,) array of dtype: the header
+    # first, the data in pieces
+    f = zf.open(name + '.npy', 'w', force_zip64 = True)
+
+    np.lib.format.write_array_header_1_0(f, {'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)),
+                                             'fortran_order': False, 'shape': (n,)})
+
+    return f
+
+def to_npz(source, path, volts = True, dtype = np.float32, chunk = CHUNK,
+           progress = None, compresslevel = COMPRESSLEVEL):
+
+    # Compressed NPZ: ch1, ch2 - volts (dtype) or the raw codes if not
+    # volts; per frame of the source: starts (first sample), t0,
+    # samplerate, vdiv, cal. Channels are written one after the other in
+    # pieces, memory stays bounded for any size.
+    # np.load(path)['ch1'], time of sample n of frame k:
+    # t0[k] + (n - starts[k]) / samplerate[k]
+    first = next(iter(frames(source)))
+
+    c = first.channels
+
+    n = total(source)
+
+    meta = {'starts': [], 't0': [], 'samplerate': [], 'vdiv': [], 'cal': []}
+
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED,
+                         compresslevel = compresslevel) as zf:
+
+        done = 0
+
+        for i in range(c):
+
+            f = npy_member(zf, 'ch%d' % (i + 1), dtype if volts else first.raw.dtype, n)
+
+            pos = 0
+            last = None
+
+            for k, piece in pieces(source, chunk, progress, c, done):
+
+                if piece.channels != c:
+
+                    raise ValueError('Channels change within the source')
+
+                if i == 0 and k != last:
+
+                    last = k
+
+                    meta['starts'].append(pos)
+                    meta['t0'].append(piece.t0)
+                    meta['samplerate'].append(piece.samplerate)
+                    meta['vdiv'].append(piece.ChVDiv)
+                    meta['cal'].append(piece.cal)
+
+                f.write(piece.volts(i, dtype) if volts else
+                        np.ascontiguousarray(piece.ch(i)))
+
+                pos += len(piece)
+
+            f.close()
+
+            done += n
+
+        for name, value in meta.items():
+
+            with zf.open(name + '.npy', 'w') as f:
+
+                np.lib.format.write_array(f, np.array(value, dtype = np.float64
+                                                      if name != 'starts' else np.int64))
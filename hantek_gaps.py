@@ -0,0 +1,287 @@
+import numpy as np
+
+#%% Settings
+
+# At 48 MS/s samples are uniform only inside 512 bytes USB packets:
+# 256 samples of each channel, with an unknown gap between packets
+# (512 samples of Ch1 in single channel mode, see packet_len)
+PACKET = 256
+
+# Samples of each side of a boundary in the line fits, half of it for the
+# check of the model error
+WINDOW = 128
+
+# Gaps are searched in 0 ... MAX_GAP samples
+MAX_GAP = 1024
+
+# Standard deviations of the noise in the fit tests
+Z = 3.
+
+# Error of an accepted estimate: at most TOL samples or REL of the gap
+TOL = 2.
+REL = 0.01
+
+# Smallest mean change between the sides of a boundary, codes: below it
+# the quantization steps decide
+MIN_RISE = 4.
+
+# Boundaries fitted per channel at most
+LIMIT = 256
+
+#%% Funcs
+
+def packet_len(frame):
+
+    # Samples per channel in one USB packet
+    return PACKET * 2 // frame.channels
+
+def packets(x, packet = PACKET):
+
+    # (packets, packet) float64 of channel x, the cut packet at the end dropped
+    k = len(x) // packet
+
+    return np.asarray(x[:k * packet], dtype = np.float64).reshape(k, packet)
+
+def noise(p):
+
+    # Noise variance of a sample from the second differences inside the
+    # packets (median, scaled for Gaussian noise), at least the quantization
+    d = np.diff(p, 2, axis = 1)
+
+    return max(float(np.median(d ** 2)) / (6. * 0.4549), 1. / 12.) if d.size else 1. / 12.
+
+def line_fits(p, m = WINDOW, max_gap = MAX_GAP, limit = LIMIT):
+
+    # Residuals (boundaries, max_gap + 1) of one line through the last m
+    # samples of a packet (at -m ... -1) and the first m of the next one
+    # (at g ... g + m - 1) for every gap g, in closed form for all at once,
+    # and the mean change across every boundary, codes
+    k = len(p)
+
+    i = np.arange(k - 1)
+
+    if len(i) > limit:
+
+        i = np.linspace(0, k - 2, limit).astype(np.intp)
+
+    A = p[i, -m:]
+    B = p[i + 1, :m]
+
+    u = np.arange(m, dtype = np.float64)
+    g = np.arange(max_gap + 1, dtype = np.float64)
+
+    n = 2 * m
+
+    SA = A.sum(axis = 1)[:, None]
+    SB = B.sum(axis = 1)[:, None]
+
+    st = (u - m).sum() + m * g + u.sum()
+    stt = ((u - m) ** 2).sum() + m * g ** 2 + 2. * g * u.sum() + (u ** 2).sum()
+
+    sxx = stt - st ** 2 / n
+    sxy = (A @ (u - m))[:, None] + (B @ u)[:, None] + g * SB - st / n * (SA + SB)
+    syy = (A ** 2).sum(axis = 1)[:, None] + (B ** 2).sum(axis = 1)[:, None] - (SA + SB) ** 2 / n
+
+    return syy - sxy ** 2 / sxx, np.abs(SB - SA)[:, 0] / m
+
+def limit_fit(dof, s2, z = Z):
+
+    # Largest residual of a fit with dof degrees of freedom that is noise
+    return dof * s2 * (1. + z * np.sqrt(2. / dof))
+
+def usable(r, rise, s2, dof, z = Z):
+
+    # Boundaries with one clear best gap: the line fits down to the noise,
+    # the gaps that fit almost as well are one interval [lo, hi] below
+    # MAX_GAP, the signal changes enough across the boundary
+    best = r.argmin(axis = 1)
+    rmin = r[np.arange(len(r)), best]
+
+    near = r <= rmin[:, None] + z * z * s2
+
+    lo = near.argmax(axis = 1)
+    hi = r.shape[1] - 1 - near[:, ::-1].argmax(axis = 1)
+
+    ok = (rmin <= limit_fit(dof, s2, z)) & (near.sum(axis = 1) == hi - lo + 1) & \
+         (hi < r.shape[1] - 1) & (rise >= MIN_RISE)
+
+    return ok, best, lo, hi
+
+def straight(p, m, s2, z = Z):
+
+    # Part of the windows of m samples inside the packets a line fits
+    w = p[:, :p.shape[1] // m * m].reshape(-1, m)
+
+    u = np.arange(m) - (m - 1) / 2.
+
+    r = ((w - w.mean(axis = 1)[:, None]) ** 2).sum(axis = 1) - (w @ u) ** 2 / (u ** 2).sum()
+
+    return float(np.mean(r <= limit_fit(m - 2, s2, z))) if len(w) else 0.
+
+def boundary_gaps(x, m = WINDOW, max_gap = MAX_GAP, packet = PACKET, z = Z):
+
+    # Best gap (samples) at every fitted packet boundary of channel x, NaN
+    # where it is not usable
+    p = packets(x, packet)
+
+    if len(p) < 2:
+
+        return np.zeros(0)
+
+    s2 = noise(p)
+
+    r, rise = line_fits(p, m, max_gap)
+
+    ok, best, lo, hi = usable(r, rise, s2, 2 * m - 2, z)
+
+    return np.where(ok, best, np.nan)
+
+def fit_gap(frame, m = WINDOW, max_gap = MAX_GAP, z = Z, min_valid = 8, agree = 0.5):
+
+    # One gap for the whole frame from the line fits of windows of m
+    # samples: the sum of the residual curves of the usable boundaries of
+    # all channels, minimum interpolated. None if fewer than min_valid
+    # boundaries are usable, fewer than agree of them allow the result, the
+    # result is not sharp within TOL / REL, or the signal bends so often
+    # that a gap of up to max_gap would likely hide a bend (a periodic
+    # signal with a shorter period is ambiguous).
+    ps = [packets(frame.ch(i), packet_len(frame)) for i in range(frame.channels)]
+
+    if len(ps[0]) < 2:
+
+        return None
+
+    s2 = max(noise(p) for p in ps)
+
+    fits = [line_fits(p, m, max_gap) for p in ps]
+
+    r = np.concatenate([f[0] for f in fits])
+    rise = np.concatenate([f[1] for f in fits])
+
+    ok, best, lo, hi = usable(r, rise, s2, 2 * m - 2, z)
+
+    if ok.sum() < min_valid:
+
+        return None
+
+    S = r[ok].sum(axis = 0)
+
+    b = int(S.argmin())
+
+    if b == len(S) - 1:
+
+        return None
+
+    gap = float(b)
+
+    if b > 0:
+
+        y0, y1, y2 = S[b - 1:b + 2]
+
+        if y0 - 2. * y1 + y2 > 0.:
+
+            gap += 0.5 * (y0 - y2) / (y0 - 2. * y1 + y2)
+
+    near = np.flatnonzero(S <= S[b] + z * z * s2)
+
+    if near[-1] - near[0] > 2. * max(TOL, REL * gap):
+
+        return None
+
+    if np.mean((lo[ok] - 1 <= gap) & (gap <= hi[ok] + 1)) < agree:
+
+        return None
+
+    q = min(straight(p, m, s2, z) for p in ps)
+
+    # Mean distance between bends
+    if q < 1. and m / (1. - q) < max_gap + 2 * m:
+
+        return None
+
+    return max(gap, 0.)
+
+def estimate_gap(frame, m = WINDOW, max_gap = MAX_GAP, **kw):
+
+    # Gap (samples) between the packets of a 48 MS/s frame, None if the
+    # signal doesn't tell it within TOL / REL: a line through both sides of
+    # a boundary. It needs slopes that stay straight across the gap
+    # (ramps, triangles, sines much slower than the gap); a line bends away
+    # from a curved signal over a long gap, so windows of m and m // 2
+    # samples are compared and their difference scaled to the error of the
+    # first (it grows as the square of the fitted span).
+    a = fit_gap(frame, m, max_gap, **kw)
+
+    if a is None:
+
+        return None
+
+    b = fit_gap(frame, m // 2, max_gap, **kw)
+
+    if b is None:
+
+        return None
+
+    sa, sb = 2 * m + a, m + b
+
+    if abs(a - b) * sa ** 2 / (sa ** 2 - sb ** 2) > max(TOL, REL * a):
+
+        return None
+
+    return a
+
+#%% Classes
+
+class PacketTiming:
+
+    # Time axis of 48 MS/s frames with inter-packet gaps.
+    # gap - samples between packets, None - estimated from the data and
+    # smoothed over frames with factor smooth
+
+    def __init__(self, gap = None, smooth = 0.1):
+
+        self.fixed = gap is not None
+        self.gap = gap
+        self.smooth = smooth
+
+    def update(self, frame):
+
+        if not self.fixed:
+
+            g = estimate_gap(frame)
+
+            if g is not None:
+
+                self.gap = g if self.gap is None else \
+                    (1. - self.smooth) * self.gap + self.smooth * g
+
+        return self.gap
+
+    def packet_times(self, frame):
+
+        # Start time of every packet, s
+        p = packet_len(frame)
+        k = -(-len(frame) // p)
+
+        return frame.t0 + np.arange(k) * (p + (self.gap or 0.)) * frame.dt
+
+    def timestamps(self, frame):
+
+        # Time of every sample, s
+        t = self.packet_times(frame)[:, None] + np.arange(packet_len(frame)) * frame.dt
+
+        return t.ravel()[:len(frame)]
+
+    def resample(self, frame, i, dtype = np.float64):
+
+        # Channel i in volts on a uniform grid with the nominal dt over the
+        # whole capture, gaps included. Returns (t0, dt, volts).
+        t = self.timestamps(frame)
+
+        n = int((t[-1] - t[0]) / frame.dt) + 1
+
+        grid = t[0] + np.arange(n) * frame.dt
+
+        y = np.interp(grid, t, frame.volts(i))
+
+        return t[0], frame.dt, y.astype(dtype, copy = False)
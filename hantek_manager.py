@@ -0,0 +1,265 @@
+import queue, threading, time
+from concurrent.futures import ThreadPoolExecutor
+import usb.core
+import pyhantek6022BE as pyhantek
+from pyhantek6022BE import load_firmware
+
+#%% Settings
+
+# 0x04b4 - no firmware yet, 0x04b5 - after the firmware upload
+VENDOR_EMPTY = 0x04b4
+VENDOR = 0x04b5
+PRODUCT = 0x6022
+
+#%% Funcs
+
+def place(dev):
+
+    # (bus, port numbers): where the device is plugged in, the same before
+    # and after re-enumeration (the address changes)
+    ports = getattr(dev, 'port_numbers', None)
+
+    return (dev.bus, tuple(ports) if ports else (dev.address,))
+
+def serial(dev):
+
+    try:
+
+        return dev.serial_number
+
+    except (usb.core.USBError, ValueError, NotImplementedError):
+
+        return None
+
+def load_all(find = usb.core.find, timeout = 10., period = 0.05):
+
+    # Loads the firmware into every device without it at once and waits
+    # until all of them come back, returns their number
+    empty = list(find(find_all = True, idVendor = VENDOR_EMPTY, idProduct = PRODUCT))
+
+    if not empty:
+
+        return 0
+
+    print('Firmware is loading into %d devices...' % len(empty))
+
+    with ThreadPoolExecutor(len(empty)) as ex:
+
+        list(ex.map(load_firmware, empty))
+
+    places = {place(d) for d in empty}
+
+    deadline = time.perf_counter() + timeout
+
+    while True:
+
+        found = {place(d) for d in find(find_all = True, idVendor = VENDOR,
+                                        idProduct = PRODUCT)}
+
+        if places <= found:
+
+            break
+
+        if time.perf_counter() >= deadline:
+
+            print('Not re-enumerated:', sorted(places - found))
+
+            break
+
+        time.sleep(period)
+
+    return len(empty)
+
+#%% Classes
+
+class Unit:
+
+    # One scope of DeviceManager
+
+    def __init__(self, index, dev):
+
+        self.index = index
+        self.place = place(dev)
+        self.serial = serial(dev)
+        self.h0 = pyhantek.Hantek(dev)
+
+        self.thread = None
+        self.frames = 0
+        self.dropped = 0
+        self.error = None
+
+    def __repr__(self):
+
+        return 'Unit(%d, place = %s, serial = %r)' % (self.index, self.place, self.serial)
+
+class DeviceManager:
+
+    # Several 6022BE in one process. open() loads the firmware into new
+    # devices (all at once), opens the selected ones, start() runs one
+    # acquisition thread per scope: libusb releases the GIL during
+    # transfers, so scopes on different host controllers capture in
+    # parallel instead of one after another.
+    # get() returns (unit, stamp, frame): stamp - time.perf_counter() right
+    # before the capture started, frame.t0 - the same moment in s since
+    # start(), a common timebase for frames of all scopes. At most maxsize
+    # frames wait for the consumer, older ones are dropped (unit.dropped).
+    #
+    # with DeviceManager(find = SimBus(HantekSim(serial = 'A'), ...).find) as m:
+    #     m.open(); m.apply(Config(1_000_000)); m.start()
+    #     unit, stamp, frame = m.get()
+
+    def __init__(self, find = usb.core.find, timeout = 10., maxsize = 64):
+
+        self.find = find
+        self.timeout = timeout
+
+        self.units = []
+        self.queue = queue.Queue(maxsize)
+        self.running = threading.Event()
+        self.base = None
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *args):
+
+        self.close()
+
+    def scan(self):
+
+        # (place, serial) of every device with the firmware
+        return [(place(d), serial(d))
+                for d in self.find(find_all = True, idVendor = VENDOR, idProduct = PRODUCT)]
+
+    def open(self, select = None):
+
+        # select - serials and / or places (bus, port numbers), None - all
+        load_all(self.find, self.timeout)
+
+        devs = [d for d in self.find(find_all = True, idVendor = VENDOR, idProduct = PRODUCT)
+                if select is None or serial(d) in select or place(d) in select]
+
+        if not devs:
+
+            raise ValueError('Device Hantek 6022BE not found')
+
+        # Hantek() sends the initial settings, every device on its own
+        with ThreadPoolExecutor(len(devs)) as ex:
+
+            self.units = list(ex.map(Unit, range(len(devs)), devs))
+
+        return self.units
+
+    def apply(self, config):
+
+        # The same Config for all scopes, see Hantek.apply
+        return [u.h0.apply(config) for u in self.units]
+
+    def start(self):
+
+        self.base = time.perf_counter()
+
+        self.running.set()
+
+        for u in self.units:
+
+            u.thread = threading.Thread(target = self.run, args = (u,), daemon = True,
+                                        name = 'hantek-%d' % u.index)
+
+            u.thread.start()
+
+    def run(self, unit):
+
+        h0 = unit.h0
+
+        while self.running.is_set():
+
+            stamp = time.perf_counter()
+
+            try:
+
+                frame = h0.Capture() if h0.trigger is None else h0.CaptureTriggered()
+
+            except usb.core.USBError as e:
+
+                print('Capture failed on', unit, e)
+
+                unit.error = e
+
+                break
+
+            if frame is None:
+
+                continue
+
+            frame = frame.sub(frame.raw, frame.t0 + stamp - self.base)
+
+            unit.frames += 1
+
+            self.put((unit, stamp, frame))
+
+    def put(self, item):
+
+        while True:
+
+            try:
+
+                self.queue.put_nowait(item)
+
+                return
+
+            except queue.Full:
+
+                pass
+
+            try:
+
+                self.queue.get_nowait()[0].dropped += 1
+
+            except queue.Empty:
+
+                pass
+
+    def get(self, timeout = None):
+
+        # (unit, stamp, frame), None if nothing came in timeout, s
+        try:
+
+            return self.queue.get(timeout = timeout)
+
+        except queue.Empty:
+
+            return None
+
+    def frames(self):
+
+        while self.running.is_set():
+
+            item = self.get(0.1)
+
+            if item is not None:
+
+                yield item
+
+    def stop(self):
+
+        self.running.clear()
+
+        for u in self.units:
+
+            if u.thread is not None:
+
+                u.thread.join()
+
+                u.thread = None
+
+    def close(self):
+
+        self.stop()
+
+        for u in self.units:
+
+            u.h0.close()
+
+        self.units = []
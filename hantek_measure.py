@@ -0,0 +1,436 @@
+import numpy as np
+
+from hantek_trigger import RISE, FALL
+
+#%% Settings
+
+# Per channel: volts, Hz, s, duty in %, rise / fall 10 - 90 % in s
+MEASUREMENTS = ['vmin', 'vmax', 'vpp', 'mean', 'rms', 'base', 'top', 'amplitude',
+                'freq', 'period', 'duty', 'rise', 'fall']
+
+# Ch2 relative to Ch1, degrees in (-180, 180]
+PHASE = 'phase'
+
+#%% Funcs
+
+def histogram(q):
+
+    # Histograms of the rows of q (m, n) with values 0 - 255, (m, 256).
+    # bincount of the uint8 rows as they are is faster than one bincount of
+    # the whole stack with row offsets, which needs an int32 copy.
+    out = np.empty((len(q), 256), dtype = np.int64)
+
+    for k, row in enumerate(q):
+
+        out[k] = np.bincount(row, minlength = 256)
+
+    return out
+
+def entries(mask):
+
+    # Flat indices where the rows of mask (m, n) become True, the first
+    # column counts as an entry
+    e = np.empty_like(mask)
+
+    e[:, 0] = mask[:, 0]
+
+    np.greater(mask[:, 1:], mask[:, :-1], out = e[:, 1:])
+
+    return np.flatnonzero(e)
+
+def crossings(x, level, hysteresis, slope = RISE):
+
+    # Crossings of level (m,) by the rows of x (m, n) in the slope direction
+    # after the row was beyond level -/+ hysteresis (see hantek_trigger.edges),
+    # interpolated between samples. Returns (rows, t): sorted by row, then t.
+    m, n = x.shape
+
+    if x.dtype == np.uint8:
+
+        # Integer thresholds: uint8 comparisons without casting
+        th = lambda v, f: f(v).clip(0, 255).astype(np.uint8)[:, None]
+
+        if slope == FALL:
+
+            fire = x <= th(level, np.floor)
+            arm = x > th(level + hysteresis, np.floor)
+
+        else:
+
+            fire = x >= th(level, np.ceil)
+            arm = x < th(level - hysteresis, np.ceil)
+
+    elif slope == FALL:
+
+        fire = x <= level[:, None]
+        arm = x > (level + hysteresis)[:, None]
+
+    else:
+
+        fire = x >= level[:, None]
+        arm = x < (level - hysteresis)[:, None]
+
+    # Entries into the fire region are crossings if the row entered the arm
+    # region since the previous one (or since the row start: every row
+    # starts fired)
+    c = entries(fire)
+    a = entries(arm)
+
+    if not len(c):
+
+        return c, np.zeros(0)
+
+    rc = c // n
+
+    A = np.searchsorted(a, c)
+
+    prev = np.empty_like(A)
+    prev[0] = 0
+    prev[1:] = A[:-1]
+
+    first = np.ones(len(c), dtype = bool)
+    first[1:] = rc[1:] != rc[:-1]
+
+    prev[first] = np.searchsorted(a, rc[first] * n)
+
+    e = c[A > prev]
+    r = e // n
+
+    # The sample before a crossing is in the same row, on the other side
+    xf = x.ravel()
+
+    y0 = xf[e - 1].astype(np.float64)
+    y1 = xf[e].astype(np.float64)
+
+    return r, e % n - 1 + (level[r] - y0) / (y1 - y0)
+
+def row_mean(r, v, m):
+
+    # Mean of v per row r, NaN for rows without values
+    with np.errstate(invalid = 'ignore'):
+
+        return np.bincount(r, v, minlength = m) / np.bincount(r, minlength = m)
+
+def pairs(r, t, r2, t2, n, after = True):
+
+    # For each crossing (r, t) the index of the next (after) or previous
+    # crossing in (r2, t2) of the same row, -1 if there is none
+    g = r * n + t
+    g2 = r2 * n + t2
+
+    if after:
+
+        j = np.searchsorted(g2, g, side = 'right')
+
+    else:
+
+        j = np.searchsorted(g2, g, side = 'left') - 1
+
+    ok = (j >= 0) & (j < len(g2))
+    ok[ok] &= r2[j[ok]] == r[ok]
+
+    return np.where(ok, j, -1)
+
+def period(r, t, m):
+
+    # Mean period per row from its first and last crossing, samples
+    c = np.bincount(r, minlength = m)
+
+    first = np.searchsorted(r, np.arange(m))
+    last = np.searchsorted(r, np.arange(m), side = 'right') - 1
+
+    out = np.full(m, np.nan)
+
+    ok = c >= 2
+
+    out[ok] = (t[last[ok]] - t[first[ok]]) / (c[ok] - 1)
+
+    return out
+
+def measure(x, zero = 0., scale = 1., dt = 1., select = None, hysteresis = 0.1):
+
+    # Measurements of a stack of one channel captures in one pass.
+    # x - (m, n) uint8 codes with zero, scale of Frame.cal (scalars or (m,)),
+    #     or float volts (zero, scale ignored); dt - s per sample.
+    # hysteresis - of the edge detection, part of the amplitude.
+    # Returns ({name: (m,)}, rising 50 % crossings (rows, t)).
+    select = set(MEASUREMENTS if select is None else select)
+
+    x = np.atleast_2d(x)
+    m, n = x.shape
+
+    res = {}
+
+    if x.dtype == np.uint8:
+
+        q = x
+
+        zero = np.broadcast_to(np.asarray(zero, dtype = np.float64), (m,))
+        scale = np.broadcast_to(np.asarray(scale, dtype = np.float64), (m,))
+
+        h = histogram(q)
+
+        # Value of every histogram bin in units of x (codes)
+        lo, width = np.zeros(m), np.ones(m)
+
+        codes = np.arange(256.)
+
+        s1 = h @ codes
+        s2 = h @ codes ** 2
+
+        res['mean'] = (s1 / n - zero) * scale
+        res['rms'] = np.sqrt(np.maximum(s2 / n - 2. * zero * s1 / n + zero ** 2, 0.)) * scale
+
+        nz = h > 0
+
+        xmin = nz.argmax(axis = 1).astype(np.float64)
+        xmax = 255. - nz[:, ::-1].argmax(axis = 1)
+
+    else:
+
+        x = np.asarray(x, dtype = np.float64)
+
+        zero, scale = np.zeros(m), np.ones(m)
+
+        xmin = x.min(axis = 1)
+        xmax = x.max(axis = 1)
+
+        lo, width = xmin, np.maximum(xmax - xmin, 1e-12) / 255.
+
+        q = ((x - lo[:, None]) / width[:, None]).astype(np.uint8)
+
+        h = histogram(q)
+
+        res['mean'] = x.mean(axis = 1)
+        res['rms'] = np.sqrt(np.einsum('ij,ij->i', x, x) / n)
+
+    volts = lambda u: (u - zero) * scale
+
+    res['vmin'] = volts(xmin)
+    res['vmax'] = volts(xmax)
+    res['vpp'] = res['vmax'] - res['vmin']
+
+    # Base / top: histogram modes below / above the middle of the range
+    mid = ((xmin + xmax) / 2. - lo) / width
+
+    below = np.arange(256) < mid[:, None]
+
+    base = lo + width * np.where(below, h, -1).argmax(axis = 1)
+    top = lo + width * np.where(below, -1, h).argmax(axis = 1)
+
+    res['base'] = volts(base)
+    res['top'] = volts(top)
+    res['amplitude'] = res['top'] - res['base']
+
+    amp = np.maximum(top - base, 1e-12)
+
+    level = lambda p: base + p * amp
+
+    dt = np.broadcast_to(np.asarray(dt, dtype = np.float64), (m,))
+
+    R = crossings(x, level(0.5), hysteresis * amp, RISE)
+
+    if select & {'freq', 'period', 'duty'}:
+
+        p = period(R[0], R[1], m)
+
+        res['period'] = p * dt
+
+        with np.errstate(divide = 'ignore'):
+
+            res['freq'] = 1. / res['period']
+
+    if 'duty' in select:
+
+        # High time of every full cycle over its period
+        F = crossings(x, level(0.5), hysteresis * amp, FALL)
+
+        r, t = R
+
+        nxt = np.flatnonzero(r[1:] == r[:-1])
+
+        j = pairs(r[nxt], t[nxt], F[0], F[1], n)
+
+        ok = j >= 0
+        ok[ok] &= F[1][j[ok]] < t[nxt + 1][ok]
+
+        k = nxt[ok]
+
+        res['duty'] = 100. * row_mean(r[k], (F[1][j[ok]] - t[k]) / (t[k + 1] - t[k]), m)
+
+    if 'rise' in select:
+
+        a = crossings(x, level(0.1), hysteresis / 2. * amp, RISE)
+        b = crossings(x, level(0.9), hysteresis / 2. * amp, RISE)
+
+        j = pairs(b[0], b[1], a[0], a[1], n, after = False)
+
+        ok = j >= 0
+
+        res['rise'] = row_mean(b[0][ok], b[1][ok] - a[1][j[ok]], m) * dt
+
+    if 'fall' in select:
+
+        a = crossings(x, level(0.9), hysteresis / 2. * amp, FALL)
+        b = crossings(x, level(0.1), hysteresis / 2. * amp, FALL)
+
+        j = pairs(b[0], b[1], a[0], a[1], n, after = False)
+
+        ok = j >= 0
+
+        res['fall'] = row_mean(b[0][ok], b[1][ok] - a[1][j[ok]], m) * dt
+
+    return {k: v for k, v in res.items() if k in select}, R
+
+def phase(R1, R2, period, n):
+
+    # Circular mean phase of Ch2 rising crossings after those of Ch1,
+    # period - of Ch1 in samples (m,), degrees in (-180, 180]
+    m = len(period)
+
+    j = pairs(R1[0], R1[1], R2[0], R2[1], n)
+
+    ok = j >= 0
+
+    r = R1[0][ok]
+
+    phi = 2. * np.pi * (R2[1][j[ok]] - R1[1][ok]) / period[r]
+
+    good = np.isfinite(phi)
+
+    r, phi = r[good], phi[good]
+
+    c = np.bincount(r, np.cos(phi), minlength = m)
+    s = np.bincount(r, np.sin(phi), minlength = m)
+
+    out = np.degrees(np.arctan2(s, c))
+
+    out[np.bincount(r, minlength = m) == 0] = np.nan
+
+    return out
+
+#%% Classes
+
+class RunningStats:
+
+    # min / max / mean / std of every measurement over all frames so far,
+    # updated a batch at a time (Chan et al. parallel variance). NaN values
+    # (measurement not possible) are not counted.
+
+    def __init__(self):
+
+        self.reset()
+
+    def reset(self):
+
+        self.stats = {} # name -> [count, mean, M2, min, max]
+
+    def update(self, results):
+
+        for name, v in results.items():
+
+            v = np.asarray(v, dtype = np.float64)
+
+            ok = ~np.isnan(v)
+
+            nb = ok.sum(axis = 0)
+
+            if name not in self.stats:
+
+                shape = v.shape[1:]
+
+                self.stats[name] = [np.zeros(shape), np.zeros(shape), np.zeros(shape),
+                                    np.full(shape, np.inf), np.full(shape, -np.inf)]
+
+            st = self.stats[name]
+
+            with np.errstate(invalid = 'ignore', divide = 'ignore'):
+
+                mb = np.where(ok, v, 0.).sum(axis = 0) / nb
+
+                m2b = (np.where(ok, v - mb, 0.) ** 2).sum(axis = 0)
+
+                n = st[0] + nb
+
+                delta = np.where(nb > 0, mb - st[1], 0.)
+
+                st[1] = np.where(nb > 0, st[1] + delta * nb / n, st[1])
+                st[2] = np.where(nb > 0, st[2] + m2b + delta ** 2 * st[0] * nb / n, st[2])
+
+            st[0] = n
+            st[3] = np.minimum(st[3], np.where(ok, v, np.inf).min(axis = 0))
+            st[4] = np.maximum(st[4], np.where(ok, v, -np.inf).max(axis = 0))
+
+    def summary(self):
+
+        out = {}
+
+        for name, (n, mean, m2, vmin, vmax) in self.stats.items():
+
+            with np.errstate(invalid = 'ignore', divide = 'ignore'):
+
+                std = np.sqrt(m2 / (n - 1))
+
+            out[name] = {'count': n, 'mean': mean, 'std': std,
+                         'min': vmin, 'max': vmax}
+
+        return out
+
+class Measure:
+
+    # Measurements of frames (one Frame or a list of frames of the same
+    # length) straight from the raw uint8 data, both channels and the phase
+    # between them. Every call updates self.stats.
+    # Returns {name: (frames, channels)}, 'phase': (frames,).
+
+    def __init__(self, select = None, hysteresis = 0.1):
+
+        self.select = list(MEASUREMENTS) + [PHASE] if select is None else list(select)
+        self.hysteresis = hysteresis
+        self.stats = RunningStats()
+
+    def __call__(self, frames):
+
+        if not isinstance(frames, (list, tuple)):
+
+            frames = [frames]
+
+        channels = min(f.channels for f in frames)
+
+        n = len(frames[0])
+
+        dt = np.array([f.dt for f in frames])
+
+        select = [s for s in self.select if s != PHASE]
+
+        if PHASE in self.select:
+
+            select = set(select) | {'period'}
+
+        out = {}
+        R = []
+
+        for i in range(channels):
+
+            x = np.stack([f.ch(i)[:n] for f in frames])
+
+            cal = np.array([f.cal[i] for f in frames])
+
+            res, r = measure(x, cal[:, 0], cal[:, 1], dt, select, self.hysteresis)
+
+            R.append((r, res.get('period')))
+
+            for k, v in res.items():
+
+                out.setdefault(k, []).append(v)
+
+        out = {k: np.stack(v, axis = 1) for k, v in out.items()
+               if k in self.select}
+
+        if PHASE in self.select and channels == 2:
+
+            out[PHASE] = phase(R[0][0], R[1][0], R[0][1] / dt, n)
+
+        self.stats.update(out)
+
+        return out
@@ -0,0 +1,106 @@
+import numpy as np
+
+#%% Settings
+
+# Raw codes: rows of the histogram
+LEVELS = 256
+
+#%% Classes
+
+class Persistence:
+
+    # Intensity graded persistence of one channel: a (time bin x 256 codes)
+    # histogram of the raw uint8 samples, one np.bincount per frame, so a
+    # glitch in one frame of thousands stays visible without redrawing
+    # curves. Bins cover the whole frame, frames of another length, sample
+    # rate or V / DIV start anew.
+    # decay - None: counts of all frames since reset() (uint32), else the
+    # histogram is multiplied by decay every frame (float32), e.g.
+    # 0.5 ** (1 / 100) halves a trace in 100 frames.
+
+    def __init__(self, width = 1024, ch = 0, decay = None):
+
+        if decay is not None and not 0. < decay < 1.:
+
+            raise ValueError('Decay must be in (0, 1)')
+
+        self.width = width
+        self.ch = ch
+        self.decay = decay
+
+        self.reset()
+
+    def reset(self):
+
+        self.key = None
+        self.last = None
+        self.frames = 0
+        self.hist = np.zeros((self.width, LEVELS),
+                             dtype = np.uint32 if self.decay is None else np.float32)
+
+        # Bin of every sample times LEVELS, and its + code buffer
+        self.base = None
+        self.idx = None
+
+    def add(self, frame):
+
+        key = (len(frame), frame.samplerate, frame.ChVDiv, frame.cal,
+               frame.channels)
+
+        if key != self.key:
+
+            self.reset()
+
+            self.key = key
+
+            n = len(frame)
+
+            self.base = np.arange(n) * self.width // n * LEVELS
+            self.idx = np.empty(n, dtype = np.intp)
+
+        self.last = frame
+
+        np.add(self.base, frame.ch(self.ch), out = self.idx)
+
+        counts = np.bincount(self.idx, minlength = self.width * LEVELS)
+
+        hist = self.hist.reshape(-1)
+
+        if self.decay is not None:
+
+            hist *= self.decay
+
+        np.add(hist, counts, out = hist, casting = 'unsafe')
+
+        self.frames += 1
+
+    def image(self, log = True):
+
+        # float32 (width, 256) in [0, 1], time along the first axis (the
+        # pyqtgraph ImageItem default). log - rare traces stay visible
+        # next to the ones hit every frame.
+        img = self.hist.astype(np.float32)
+
+        if log:
+
+            np.log1p(img, out = img)
+
+        top = img.max()
+
+        if top > 0:
+
+            img /= top
+
+        return img
+
+    def rect(self):
+
+        # (t0, v0, width, height) of the image in s and volts
+        frame = self.last
+
+        lut = frame.lut(self.ch)
+
+        # Codes are the centers of the rows
+        step = lut[1] - lut[0]
+
+        return (frame.t0, lut[0] - step / 2., len(frame) * frame.dt, LEVELS * step)
@@ -12,27 +12,247 @@ from pyqtgraph.Qt import QtGui, QtCore, QtWidgets
 import pyqtgraph as pg
 import multiprocessing as mp
 import time
+from hantek_shm import FrameRing
+from hantek_decimate import Decimator, follow
+from hantek_stats import Stats
+from hantek_spectrum import Spectrum
+from hantek_average import Average
+from hantek_persist import Persistence
+from hantek_trigger import Trigger
+from hantek_dsp import Oversampler, chain
+from hantek_stream import Stream
 
 #%% Funcs
 
-def updateGraph(qu1):
+def updateGraph(name, method = 'minmax', stats = False, spectrum = None,
+                nfft = 4096, average = None, average_mode = 'linear',
+                persist = None):
+
+    # spectrum - units of the spectrum tab ('dBV', 'dBm'), None - no tab
+    # average - frames to average on display, None - every frame as is
+    # persist - decay of the persistence tab per frame, 1 - infinite,
+    #           None - no tab (uint8 frames only, not the oversampled ones)
+    if spectrum is None and persist is None:
    
-    plot1 = pg.plot(title = "Plot ADC")
+        plot1 = pg.plot(title = "Plot ADC")
+
+    else:
+
+        tabs = QtWidgets.QTabWidget()
+
+        plot1 = pg.PlotWidget(title = "Plot ADC")
+
+        tabs.addTab(plot1, 'Scope')
+
+        tabs.show()
+
+    if spectrum is not None:
+
+        plot2 = pg.PlotWidget(title = "Spectrum")
+
+        plot2.setLabel('left', spectrum)
+        plot2.setLabel('bottom', 'Hz')
+
+        spectrum_tab = tabs.addTab(plot2, 'Spectrum')
+
+        # Welch averaging over the last ~100 frames of each channel
+        spectra = [Spectrum(nfft, ch = i, alpha = 0.01) for i in range(2)]
+
+        spec_curves = [plot2.plot([0], [0], pen = pg.mkPen(c, width = 1))
+                       for c in 'rg']
+
+    if persist is not None:
+
+        plot3 = pg.PlotWidget(title = "Persistence Ch1")
+
+        plot3.setLabel('left', 'V')
+        plot3.setLabel('bottom', 'ms')
+
+        image = pg.ImageItem()
+        image.setColorMap(pg.colormap.get('inferno'))
+
+        plot3.addItem(image)
+
+        persist_tab = tabs.addTab(plot3, 'Persistence')
+
+        # One histogram update per frame, the image only while it is shown
+        pers = Persistence(1024, 0, persist if persist < 1 else None)
     
     curve1 = plot1.plot([0], [0], pen = pg.mkPen('r', width = 1))
     curve2 = plot1.plot([0], [0], pen = pg.mkPen('g', width = 1))
+
+    vb = plot1.getViewBox()
+
+    ring = FrameRing(name)
+
+    dec = Decimator(method) if method else None
+
+    # count - frames shown, drawn - (count, range) of the last redraw
+    state = {'frame': None, 'key': None, 't0': None, 'count': 0, 'drawn': None}
+
+    avg = Average(average, average_mode) if average else None
+
+    # Overlay: frames / s, plot time and frames skipped by the viewer
+    instr = Stats() if stats else None
+
+    if instr is not None:
+
+        overlay = pg.TextItem(anchor = (0, 0))
+
+        overlay.setParentItem(vb)
+
+        shown = time.perf_counter()
+
+    def redraw(*args):
+
+        frame = state['frame']
+
+        if frame is None:
+
+            return
+
+        # Re-decimate the visible range from the full resolution frame
+        x0, x1 = vb.viewRange()[0]
+
+        # Once per frame and range: moving the range redraws too
+        if state['drawn'] == (state['count'], x0, x1):
+
+            return
+
+        state['drawn'] = (state['count'], x0, x1)
+
+        width = max(int(vb.width()), 100)
+
+        for i, curve in enumerate((curve1, curve2)[:frame.channels]):
+
+            t, v = dec(frame, i, width, (x0 / 1000., x1 / 1000.))
+
+            curve.setData(1000. * t, v)
+
+    if dec is not None:
+
+        vb.sigXRangeChanged.connect(redraw)
     
     while True:
         
-        Dat = qu1.get()
-        
-        # curve1.setData(Data[0], Data[1])
-        curve1.setData(Dat[0], Dat[1])
-        curve2.setData(Dat[0], Dat[2])
+        # Copied and checked: the producer writes back to back and reuses
+        # the slot while this frame is drawn, fed to the spectrum...
+        frame = ring.get(0.01, copy = True)
+
+        if frame is not None:
+
+            if instr is not None:
+
+                t0 = time.perf_counter()
+
+            key = (frame.samplerate, len(frame), frame.channels)
+
+            # The average keeps its own arrays, the raw frame is not needed
+            shown_frame = frame
+
+            if avg is not None:
+
+                avg.add(frame)
+
+                shown_frame = avg
+
+            if dec is not None:
+
+                # Redrawn while the user zooms
+                state['frame'] = shown_frame
+
+                state['count'] += 1
+
+                if state['key'] != key:
+
+                    state['key'] = key
+
+                    # Ch2 is off in single channel mode
+                    curve2.setVisible(frame.channels == 2)
+
+                    vb.setXRange(1000. * frame.t0,
+                                 1000. * (frame.t0 + len(frame) * frame.dt),
+                                 padding = 0)
+
+                elif frame.t0 != state['t0']:
+
+                    # Stream frames: the view moves with the data
+                    x0, x1 = follow(np.array(vb.viewRange()[0]) / 1000., state['t0'], frame)
+
+                    vb.setXRange(1000. * x0, 1000. * x1, padding = 0)
+
+                state['t0'] = frame.t0
+
+                redraw()
+
+            else:
+
+                # Time axis and buffers only when sample rate or length change
+                if state['key'] != key:
+
+                    state['key'] = key
+
+                    t = 1000. * frame.time() # ms
+                    Ch = [np.empty(len(frame)) for i in range(frame.channels)]
+
+                    curve2.setVisible(frame.channels == 2)
+
+                elif frame.t0 != state['t0']:
+
+                    # Stream frames: the time axis moves with t0
+                    t += 1000. * (frame.t0 - state['t0'])
+
+                state['t0'] = frame.t0
+
+                for i, curve in enumerate((curve1, curve2)[:frame.channels]):
+
+                    shown_frame.volts(i, out = Ch[i])
+
+                    curve.setData(t, Ch[i])
+
+            if spectrum is not None:
+
+                for i, curve in enumerate(spec_curves[:frame.channels]):
+
+                    spectra[i].feed(frame)
+
+                    if tabs.currentIndex() == spectrum_tab:
+
+                        curve.setData(spectra[i].freqs(),
+                                      spectra[i].spectrum(spectrum))
+
+            # Persistence needs the raw uint8 codes
+            if persist is not None and frame.raw.dtype == np.uint8:
+
+                pers.add(frame)
+
+                if tabs.currentIndex() == persist_tab:
+
+                    image.setImage(pers.image(), autoLevels = False, levels = (0, 1))
+
+                    x0, v0, w, h = pers.rect()
+
+                    image.setRect(QtCore.QRectF(1000. * x0, v0, 1000. * w, h))
+
+            if instr is not None:
+
+                instr.record('plot', time.perf_counter() - t0)
+                instr.add('frames')
+
+                instr.counters['dropped_frames'] = ring.skipped
+
+                if time.perf_counter() - shown > 0.5:
+
+                    shown = time.perf_counter()
+
+                    s = instr.summary()
+
+                    overlay.setText('%.1f FPS, plot %.1f ms, dropped %d' %
+                                    (s['frames_per_s'],
+                                     s['stages']['plot']['mean_ms'],
+                                     ring.skipped))
         
         QtWidgets.QApplication.processEvents()
-        
-        time.sleep(0.01)
 
 #%% Settings
 
@@ -40,6 +260,30 @@ SR = 16_000_000 # samples / s per channel
 
 ChVDIV = [1, 1] # V / Div
 
+CHANNELS = 2 # 1 - Ch1 only with double record length (firmware support needed)
+
+DECIMATE = 'minmax' # display decimation: 'minmax', 'lttb', None - all points
+
+PERIOD = None # s between captures (e.g. 0.1 to save CPU), None - back to back: the ring keeps only the latest frame
+
+STATS = False # timing overlay in the viewer and acquisition stats every 5 s
+
+SPECTRUM = None # spectrum tab units: 'dBV', 'dBm', None - no spectrum
+
+AVERAGE = None # frames to average on display, None - off
+
+AVERAGE_MODE = 'linear' # 'linear' - blocks of AVERAGE frames, 'exp' - exponential
+
+TRIGGER = None # e.g. Trigger(0, 128): software trigger, aligns frames to average
+
+PERSIST = None # persistence tab of Ch1: decay per frame (0.99), 1 - infinite, None - off
+
+OVERSAMPLE = None # e.g. 160: filtered, decimated display with finer codes from a Stream, None - off
+
+# OVERSAMPLE: the filters need gapless data, so a Stream replaces the
+# captures (no TRIGGER) and every frame is filtered here before the ring,
+# not with AVERAGE
+
 #%% Apply settings
 
 h0 = pyhantek.Hantek()
@@ -48,28 +292,82 @@ h0.set_chvdiv(ChVDIV)
 
 h0.set_samplerate(SR)
 
-t = 1000. * h0.get_time()
+if CHANNELS != 2:
+
+    h0.set_channels(CHANNELS)
+
+if STATS:
+
+    h0.set_stats(Stats())
+
+h0.trigger = TRIGGER
+
+ov = stream = None
+
+if OVERSAMPLE and not AVERAGE:
+
+    ov = Oversampler(chain(OVERSAMPLE))
+
+    stream = Stream(h0)
+
+    stream.start()
 
 #%% Graph process
 
-que1 = mp.Queue()
+# Последний кадр в общей памяти, старые кадры пропускаются
+ring = FrameRing()
 
-graph_process = mp.Process(target = updateGraph, args = (que1,))
+graph_process = mp.Process(target = updateGraph, args = (ring.name, DECIMATE, STATS, SPECTRUM,
+                                                          4096, AVERAGE, AVERAGE_MODE, PERSIST))
 
 graph_process.start()
 
 #%%% Calculations
 
+reported = time.perf_counter()
+
 while True:
-    
-    Ch1, Ch2 = h0.GetData()
-    
-    que1.put((t, Ch1, Ch2))
-    
-    time.sleep(0.1)
+
+    if ov is not None:
+
+        frame = ov.feed(stream.read(h0.data_len // h0.channels))
+
+    else:
+
+        frame = h0.Capture() if TRIGGER is None else h0.CaptureTriggered()
+
+    if frame is None:
+
+        continue
+
+    if h0.instr is not None:
+
+        with h0.instr.timer('queue'):
+
+            ring.put(frame)
+
+        if time.perf_counter() - reported > 5.:
+
+            reported = time.perf_counter()
+
+            h0.instr.report()
+
+    else:
+
+        ring.put(frame)
+
+    if PERIOD:
+
+        time.sleep(PERIOD)
 
 graph_process.join()
 
+ring.close()
+
+if stream is not None:
+
+    stream.stop()
+
 h0.close()
 
 #%%%
@@ -0,0 +1,220 @@
+import os, time
+import numpy as np
+
+from pyhantek6022BE import Frame
+
+#%% Settings
+
+# Sidecar <name>.idx: MAGIC and one record per chunk of <name>.raw
+MAGIC = b'H6022IDX'
+
+# channels - 2 or 1 (single channel mode), dtype - of the samples ('|u1'
+# raw, '<i2' of hantek_dsp), the same in the file
+CHUNK = np.dtype([('offset', '<u8'), ('nbytes', '<u8'), ('samplerate', '<f8'),
+                  ('vdiv', '<f8', 2), ('t0', '<f8'), ('timestamp', '<f8'),
+                  ('cal', '<f8', (2, 2)), ('channels', '<u8'), ('dtype', 'S4')])
+
+#%% Funcs
+
+def paths(path):
+
+    base = os.path.splitext(path)[0] if path.endswith(('.raw', '.idx')) else path
+
+    return base + '.raw', base + '.idx'
+
+#%% Classes
+
+class Recorder:
+
+    # Long recording: raw interleaved uint8 frames are appended to <path>.raw
+    # as they are, <path>.idx keeps sample rate, VDiv, stream time t0, wall
+    # clock timestamp and conversion coefficients of every chunk.
+    # Frames of hantek_dsp.Oversampler (int16) are recorded the same way,
+    # one sample type per file.
+
+    def __init__(self, path):
+
+        self.raw_path, self.idx_path = paths(path)
+
+        self.raw = open(self.raw_path, 'wb')
+        self.idx = open(self.idx_path, 'wb')
+
+        self.idx.write(MAGIC)
+
+        self.offset = 0
+        self.chunks = 0
+        self.dtype = None
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *args):
+
+        self.close()
+
+    def write(self, frame, timestamp = None):
+
+        raw = frame.raw[:frame.channels * len(frame)]
+
+        if self.dtype is None:
+
+            self.dtype = raw.dtype
+
+        elif raw.dtype != self.dtype:
+
+            raise ValueError('Samples are %s in this recording, not %s' % (self.dtype, raw.dtype))
+
+        rec = np.zeros((), CHUNK)
+
+        rec['offset'] = self.offset
+        rec['nbytes'] = raw.nbytes
+        rec['samplerate'] = frame.samplerate
+        rec['vdiv'] = frame.ChVDiv
+        rec['t0'] = frame.t0
+        rec['timestamp'] = time.time() if timestamp is None else timestamp
+        rec['cal'] = frame.cal
+        rec['channels'] = frame.channels
+        rec['dtype'] = raw.dtype.str
+
+        self.raw.write(raw)
+        self.raw.flush()
+
+        # Index after data: a reader never sees a chunk that is not on disk
+        self.idx.write(rec.tobytes())
+        self.idx.flush()
+
+        self.offset += raw.nbytes
+        self.chunks += 1
+
+    def close(self):
+
+        self.raw.close()
+        self.idx.close()
+
+class Recording:
+
+    # Reader: <path>.raw is memory mapped, nothing is loaded until sliced.
+
+    def __init__(self, path):
+
+        self.raw_path, self.idx_path = paths(path)
+
+        with open(self.idx_path, 'rb') as f:
+
+            if f.read(len(MAGIC)) != MAGIC:
+
+                raise ValueError('Not a Hantek 6022BE recording: %s' % self.idx_path)
+
+            self.index = np.frombuffer(f.read(), dtype = CHUNK)
+
+        # Complete chunks only, the recorder may still be writing
+        size = os.path.getsize(self.raw_path)
+
+        self.index = self.index[self.index['offset'] + self.index['nbytes'] <= size]
+
+        dtypes = set(self.index['dtype'].tolist()) or {b'|u1'}
+
+        if len(dtypes) > 1:
+
+            raise ValueError('Mixed sample types in %s' % self.raw_path)
+
+        self.dtype = np.dtype(dtypes.pop().decode())
+
+        # Complete samples only
+        size -= size % self.dtype.itemsize
+
+        self.raw = np.memmap(self.raw_path, dtype = self.dtype, mode = 'r',
+                             shape = (size // self.dtype.itemsize,)) \
+            if size else np.zeros(0, dtype = self.dtype)
+
+        # First sample of every chunk, per channel
+        self.starts = np.r_[0, np.cumsum(self.index['nbytes'] // self.dtype.itemsize //
+                                         self.index['channels'])]
+
+    def __len__(self):
+
+        # Samples per channel
+        return int(self.starts[-1])
+
+    def ch(self, i):
+
+        # Lazy strided view of channel i over the whole recording, uint8
+        # (int16 for hantek_dsp frames).
+        # Only for recordings with the same number of channels throughout.
+        c = set(self.index['channels'].tolist()) or {2}
+
+        if len(c) > 1:
+
+            raise ValueError('Channels change within the recording, use volts()')
+
+        c = c.pop()
+
+        if i >= c:
+
+            raise ValueError('Ch%d is off in single channel mode' % (i + 1))
+
+        return self.raw[i:c * len(self):c]
+
+    def frame(self, k):
+
+        rec = self.index[k]
+
+        a = int(rec['offset']) // self.dtype.itemsize
+
+        n = int(rec['nbytes']) // self.dtype.itemsize
+
+        return Frame(self.raw[a:a + n], float(rec['samplerate']),
+                     tuple(rec['vdiv']), float(rec['t0']),
+                     [tuple(c) for c in rec['cal']], int(rec['channels']))
+
+    def chunks(self, start, stop):
+
+        # (chunk, first, last) sample ranges of chunks covering [start, stop)
+        k0 = max(np.searchsorted(self.starts, start, side = 'right') - 1, 0)
+        k1 = np.searchsorted(self.starts, stop, side = 'left')
+
+        for k in range(k0, min(k1, len(self.index))):
+
+            a = max(start, self.starts[k]) - self.starts[k]
+            b = min(stop, self.starts[k + 1]) - self.starts[k]
+
+            yield k, int(a), int(b)
+
+    def volts(self, i, start = 0, stop = None, dtype = np.float64):
+
+        # Channel i in volts for samples [start, stop), VDiv of every chunk
+        stop = len(self) if stop is None else min(stop, len(self))
+
+        out = np.empty(max(stop - start, 0), dtype = dtype)
+
+        pos = 0
+
+        for k, a, b in self.chunks(start, stop):
+
+            frame = self.frame(k)
+
+            frame.convert(i, frame.ch(i)[a:b], out = out[pos:pos + b - a])
+
+            pos += b - a
+
+        return out
+
+    def time(self, start = 0, stop = None, dtype = np.float64):
+
+        # Stream time t0 + n * dt of samples [start, stop), per chunk
+        stop = len(self) if stop is None else min(stop, len(self))
+
+        out = np.empty(max(stop - start, 0), dtype = dtype)
+
+        pos = 0
+
+        for k, a, b in self.chunks(start, stop):
+
+            rec = self.index[k]
+
+            out[pos:pos + b - a] = rec['t0'] + np.arange(a, b) / rec['samplerate']
+
+            pos += b - a
+
+        return out
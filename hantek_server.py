@@ -0,0 +1,538 @@
+# -*- coding: utf-8 -*-
+"""
+Created on %(date)s
+
+@author: %(username)s
+"""
+
+import argparse, os, queue, select, socket, threading, time
+import numpy as np
+import usb.core
+import pyhantek6022BE as pyhantek
+from pyhantek6022BE import Config, Frame
+from hantek_sim import HantekSim
+
+#%% Settings
+
+PORT = 6022
+
+# Server -> client: HEADER and nbytes of raw uint8 frame data, or of an
+# error message (ERROR_MAGIC, the last message before the server stops)
+HEADER = np.dtype([('magic', 'S4'), ('seq', '<u8'), ('nbytes', '<u4'),
+                   ('channels', '<u4'), ('samplerate', '<f8'), ('vdiv', '<f8', 2),
+                   ('t0', '<f8'), ('cal', '<f8', (2, 2))])
+
+FRAME_MAGIC = b'HFRM'
+ERROR_MAGIC = b'HERR'
+
+# Socket buffers of both ends, bytes: a slow client skips frames instead of
+# queueing seconds of them in the kernel
+SNDBUF = 1 << 16
+RCVBUF = 1 << 16
+
+# Frames FrameClient.read skips at most to get to the latest one
+MAX_SKIP = 64
+
+# Client -> server: new settings, 0 - keep the current value
+CONTROL = np.dtype([('magic', 'S4'), ('channels', '<u4'), ('samplerate', '<f8'),
+                    ('vdiv', '<f8', 2)])
+
+CONTROL_MAGIC = b'HCTL'
+
+#%% Funcs
+
+def recv_exact(sock, buf):
+
+    view = memoryview(buf).cast('B')
+    pos = 0
+
+    while pos < len(view):
+
+        n = sock.recv_into(view[pos:])
+
+        if n == 0:
+
+            raise ConnectionError('Connection is closed')
+
+        pos += n
+
+    return buf
+
+def make_socket(address):
+
+    # address - (host, port) for TCP, str - path of a Unix socket
+    family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+
+    return socket.socket(family, socket.SOCK_STREAM)
+
+#%% Classes
+
+class Client:
+
+    # One connection of FrameServer. The sender thread always sends the
+    # latest frame: a frame that arrives while the previous one is still
+    # being sent replaces the pending one and is counted in skipped, so a
+    # slow client never holds up the others.
+
+    def __init__(self, server, sock):
+
+        self.server = server
+        self.sock = sock
+        self.cond = threading.Condition()
+        self.pending = None
+        self.last = False
+        self.alive = True
+        self.closed = threading.Event()
+
+        self.sent = 0
+        self.skipped = 0
+
+    def start(self):
+
+        for target in (self.send_loop, self.recv_loop):
+
+            threading.Thread(target = target, daemon = True).start()
+
+    def offer(self, msg, last = False):
+
+        # last - the connection is closed after msg
+        with self.cond:
+
+            if self.last:
+
+                return
+
+            if self.pending is not None:
+
+                self.skipped += 1
+
+            self.pending = msg
+            self.last = last
+
+            self.cond.notify()
+
+    def send_loop(self):
+
+        try:
+
+            while True:
+
+                with self.cond:
+
+                    self.cond.wait_for(lambda: self.pending is not None or not self.alive)
+
+                    if not self.alive:
+
+                        return
+
+                    header, raw = self.pending
+
+                    self.pending = None
+
+                self.sock.sendall(header)
+                self.sock.sendall(raw)
+
+                self.sent += 1
+
+                if self.last:
+
+                    return
+
+        except OSError:
+
+            pass
+
+        finally:
+
+            self.close()
+
+    def recv_loop(self):
+
+        msg = np.zeros((), CONTROL)
+
+        try:
+
+            while self.alive:
+
+                recv_exact(self.sock, msg)
+
+                if msg['magic'] != CONTROL_MAGIC:
+
+                    raise ConnectionError('Bad control message')
+
+                self.server.controls.put(msg.copy())
+
+        except (OSError, ConnectionError):
+
+            pass
+
+        finally:
+
+            self.close()
+
+    def close(self):
+
+        with self.cond:
+
+            if not self.alive:
+
+                return
+
+            self.alive = False
+
+            self.cond.notify()
+
+        try:
+
+            self.sock.shutdown(socket.SHUT_RDWR)
+
+        except OSError:
+
+            pass
+
+        self.sock.close()
+
+        self.server.remove(self)
+
+        self.closed.set()
+
+class FrameServer:
+
+    # Owns the scope and broadcasts every captured frame to all clients as
+    # HEADER + raw uint8 data (see FrameClient). Control messages of any
+    # client are applied between captures, the next frames carry the new
+    # settings. No clients - no captures. A USB error stops the server, the
+    # clients get it as the last message.
+    # address - (host, port) for TCP, str - path of a Unix socket
+
+    def __init__(self, h0, address = ('127.0.0.1', PORT), backlog = 8,
+                 sndbuf = SNDBUF):
+
+        self.h0 = h0
+
+        if isinstance(address, str) and os.path.exists(address):
+
+            os.unlink(address)
+
+        self.listener = make_socket(address)
+
+        if not isinstance(address, str):
+
+            self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+
+        self.listener.bind(address)
+        self.listener.listen(backlog)
+
+        # accept() wakes up to see stop()
+        self.listener.settimeout(0.5)
+
+        self.sndbuf = sndbuf
+
+        # Real port if 0 was given
+        self.address = self.listener.getsockname()
+
+        self.clients = []
+        self.lock = threading.Lock()
+        self.controls = queue.Queue()
+
+        self.seq = 0
+        self.running = False
+        self.threads = []
+
+    def __enter__(self):
+
+        self.start()
+
+        return self
+
+    def __exit__(self, *args):
+
+        self.stop()
+
+    def start(self):
+
+        self.running = True
+
+        self.threads = [threading.Thread(target = t, daemon = True)
+                        for t in (self.accept_loop, self.capture_loop)]
+
+        for t in self.threads:
+
+            t.start()
+
+    def serve_forever(self):
+
+        self.start()
+
+        try:
+
+            while self.running:
+
+                time.sleep(0.5)
+
+        except KeyboardInterrupt:
+
+            pass
+
+        self.stop()
+
+    def stop(self):
+
+        self.running = False
+
+        for t in self.threads:
+
+            t.join()
+
+        self.listener.close()
+
+        for c in list(self.clients):
+
+            # The error of fail() goes out first
+            if c.last:
+
+                c.closed.wait(1.)
+
+            c.close()
+
+        if isinstance(self.address, str) and os.path.exists(self.address):
+
+            os.unlink(self.address)
+
+    def remove(self, client):
+
+        with self.lock:
+
+            if client in self.clients:
+
+                self.clients.remove(client)
+
+    def accept_loop(self):
+
+        while self.running:
+
+            try:
+
+                sock, addr = self.listener.accept()
+
+            except socket.timeout:
+
+                continue
+
+            except OSError:
+
+                break
+
+            # Small send buffer, see SNDBUF
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.sndbuf)
+
+            client = Client(self, sock)
+
+            with self.lock:
+
+                self.clients.append(client)
+
+            client.start()
+
+    def control(self, msg):
+
+        vdiv = tuple(v if v else None for v in msg['vdiv'].tolist())
+
+        config = Config(int(msg['samplerate']) or None, vdiv,
+                        int(msg['channels']) or None)
+
+        try:
+
+            self.h0.apply(config)
+
+        except ValueError as e:
+
+            print('Control message is ignored:', e)
+
+    def capture_loop(self):
+
+        while self.running:
+
+            try:
+
+                while not self.controls.empty():
+
+                    self.control(self.controls.get())
+
+                if not self.clients:
+
+                    time.sleep(0.05)
+
+                    continue
+
+                frame = self.h0.Capture()
+
+            except usb.core.USBError as e:
+
+                print('USB error, the server stops:', e)
+
+                self.fail(e)
+
+                break
+
+            self.broadcast(frame)
+
+    def fail(self, error):
+
+        # Stops the server: the error is the last message to every client
+        self.running = False
+
+        text = np.frombuffer(str(error).encode(), dtype = np.uint8)
+
+        header = np.zeros((), HEADER)
+
+        header['magic'] = ERROR_MAGIC
+        header['seq'] = self.seq
+        header['nbytes'] = len(text)
+
+        with self.lock:
+
+            clients = list(self.clients)
+
+        for c in clients:
+
+            c.offer((header.tobytes(), text), last = True)
+
+    def broadcast(self, frame):
+
+        self.seq += 1
+
+        header = np.zeros((), HEADER)
+
+        header['magic'] = FRAME_MAGIC
+        header['seq'] = self.seq
+        header['nbytes'] = len(frame.raw)
+        header['channels'] = frame.channels
+        header['samplerate'] = frame.samplerate
+        header['vdiv'] = frame.ChVDiv
+        header['t0'] = frame.t0
+        header['cal'] = frame.cal
+
+        # One message shared by all clients, the frame buffer is not reused
+        msg = (header.tobytes(), frame.raw)
+
+        with self.lock:
+
+            clients = list(self.clients)
+
+        for c in clients:
+
+            c.offer(msg)
+
+class FrameClient:
+
+    # Consumer of FrameServer: read() returns (seq, Frame), a jump in seq
+    # means frames skipped for this client. An error of the server is raised
+    # as ConnectionError.
+
+    def __init__(self, address = ('127.0.0.1', PORT), rcvbuf = RCVBUF):
+
+        self.sock = make_socket(address)
+
+        # Small receive buffer, see RCVBUF (before connect: TCP window)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+
+        self.sock.connect(address)
+
+        self.header = np.zeros((), HEADER)
+
+    def __enter__(self):
+
+        return self
+
+    def __exit__(self, *args):
+
+        self.close()
+
+    def read(self, latest = True):
+
+        # latest - frames already in the socket buffers are skipped, the
+        # newest one is returned: after a pause the client doesn't get the
+        # frames queued before it
+        item = self.receive()
+
+        for k in range(MAX_SKIP if latest else 0):
+
+            if not select.select([self.sock], [], [], 0.)[0]:
+
+                break
+
+            item = self.receive()
+
+        return item
+
+    def receive(self):
+
+        # The next message: (seq, Frame)
+        h = recv_exact(self.sock, self.header)
+
+        raw = recv_exact(self.sock, np.empty(int(h['nbytes']), dtype = np.uint8))
+
+        if h['magic'] == ERROR_MAGIC:
+
+            raise ConnectionError('Server stopped: %s' % raw.tobytes().decode(errors = 'replace'))
+
+        if h['magic'] != FRAME_MAGIC:
+
+            raise ConnectionError('Bad frame header')
+
+        return int(h['seq']), Frame(raw, float(h['samplerate']), h['vdiv'].tolist(),
+                                    float(h['t0']), [tuple(c) for c in h['cal']],
+                                    int(h['channels']))
+
+    def frames(self):
+
+        while True:
+
+            yield self.read()
+
+    def set(self, samplerate = None, ChVDiv = None, channels = None):
+
+        # Request new settings, None - keep (None for one channel of ChVDiv too)
+        msg = np.zeros((), CONTROL)
+
+        msg['magic'] = CONTROL_MAGIC
+        msg['samplerate'] = samplerate or 0
+        msg['vdiv'] = [v or 0 for v in (ChVDiv or (None, None))]
+        msg['channels'] = channels or 0
+
+        self.sock.sendall(msg.tobytes())
+
+    def close(self):
+
+        self.sock.close()
+
+#%% Main
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description = 'Hantek 6022BE frame server')
+
+    parser.add_argument('--host', default = '127.0.0.1')
+    parser.add_argument('--port', type = int, default = PORT)
+    parser.add_argument('--unix', help = 'path of a Unix socket instead of TCP')
+    parser.add_argument('--sim', action = 'store_true',
+                        help = 'serve the simulator instead of the real device')
+    parser.add_argument('--rate', type = int, default = 1_000_000)
+    parser.add_argument('--vdiv', type = float, nargs = 2, default = [1, 1])
+
+    args = parser.parse_args()
+
+    h0 = pyhantek.Hantek(HantekSim(realtime = True)) if args.sim else pyhantek.Hantek()
+
+    h0.apply(Config(args.rate, args.vdiv))
+
+    server = FrameServer(h0, args.unix or (args.host, args.port))
+
+    print('Serving on', server.address)
+
+    server.serve_forever()
+
+    h0.close()
+
+#%% End
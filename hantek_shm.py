@@ -0,0 +1,195 @@
+import time
+import numpy as np
+from multiprocessing import shared_memory
+
+from pyhantek6022BE import Frame, DATLEN_N
+
+#%% Settings
+
+HEADER = np.dtype([('slots', '<u8'), ('slot_size', '<u8'), ('latest', '<u8')])
+
+META = np.dtype([('seq', '<u8'), ('nbytes', '<u8'), ('samplerate', '<f8'),
+                 ('vdiv', '<f8', 2), ('t0', '<f8'), ('cal', '<f8', (2, 2)),
+                 ('channels', '<u8'), ('dtype', 'S4')])
+
+META_OFFSET = 64
+DATA_ALIGN = 4096
+
+#%% Classes
+
+class FrameRing:
+
+    # Frames between processes through multiprocessing.shared_memory: a fixed
+    # ring of slots, each with a sequence number. The producer never blocks,
+    # the consumer always takes the latest frame (older ones are skipped) and
+    # gets a Frame that is a view into shared memory, without copies: check
+    # valid() after using it, the producer may reuse the slot meanwhile
+    # (get(copy = True) copies and checks, for slow consumers).
+    # The time axis is not sent: Frame carries samplerate, t0 and dt.
+    # Samples are sent as they are: uint8 codes or the int16 of hantek_dsp.
+    # name None - create a new ring (producer), else attach to it (consumer)
+
+    def __init__(self, name = None, slots = 4,
+                 slot_size = max(DATLEN_N.values())):
+
+        self.owner = name is None
+
+        if self.owner:
+
+            size = self.layout(slots, slot_size)
+
+            self.shm = shared_memory.SharedMemory(create = True, size = size)
+
+        else:
+
+            try:
+
+                self.shm = shared_memory.SharedMemory(name, track = False)
+
+            except TypeError:
+
+                # Python < 3.13 registers the ring once more with the resource
+                # tracker, harmless for child processes that share it
+                self.shm = shared_memory.SharedMemory(name)
+
+            header = np.ndarray((), HEADER, self.shm.buf)
+
+            slots, slot_size = int(header['slots']), int(header['slot_size'])
+
+            del header
+
+            self.layout(slots, slot_size)
+
+        buf = self.shm.buf
+
+        self.header = np.ndarray((), HEADER, buf)
+        self.meta = np.ndarray((slots,), META, buf, META_OFFSET)
+        self.data = np.ndarray((slots, slot_size), np.uint8, buf, self.data_offset)
+
+        if self.owner:
+
+            self.header['slots'] = slots
+            self.header['slot_size'] = slot_size
+            self.header['latest'] = 0
+            self.meta['seq'] = 0
+
+        self.seq = int(self.header['latest']) # last written / seen
+        self.skipped = 0 # frames the consumer never saw
+
+    def layout(self, slots, slot_size):
+
+        self.data_offset = -(-(META_OFFSET + slots * META.itemsize)
+                             // DATA_ALIGN) * DATA_ALIGN
+
+        return self.data_offset + slots * slot_size
+
+    @property
+    def name(self):
+
+        return self.shm.name
+
+    def put(self, frame):
+
+        raw = frame.raw.view(np.uint8)
+
+        nbytes = len(raw)
+
+        if nbytes > self.data.shape[1]:
+
+            raise ValueError('Frame of %d bytes does not fit the slot' % nbytes)
+
+        seq = self.seq + 1
+        slot = seq % len(self.meta)
+
+        # seq = 0 marks the slot as being written
+        self.meta['seq'][slot] = 0
+
+        self.data[slot, :nbytes] = raw
+
+        self.meta['nbytes'][slot] = nbytes
+        self.meta['samplerate'][slot] = frame.samplerate
+        self.meta['vdiv'][slot] = frame.ChVDiv
+        self.meta['t0'][slot] = frame.t0
+        self.meta['cal'][slot] = frame.cal
+        self.meta['channels'][slot] = frame.channels
+        self.meta['dtype'][slot] = frame.raw.dtype.str
+
+        self.meta['seq'][slot] = seq
+        self.header['latest'] = seq
+
+        self.seq = seq
+
+    def get(self, timeout = 0., period = 0.001, copy = False):
+
+        # Latest frame not seen yet, or None after timeout, s.
+        # copy - the frame is copied out of the ring and checked: a slot
+        # reused during the copy is dropped for the newer frame (seqlock)
+        deadline = time.perf_counter() + timeout
+
+        while True:
+
+            latest = int(self.header['latest'])
+
+            if latest != self.seq:
+
+                slot = latest % len(self.meta)
+
+                if int(self.meta['seq'][slot]) == latest:
+
+                    m = self.meta[slot].copy()
+
+                    raw = self.data[slot, :int(m['nbytes'])].view(m['dtype'].decode())
+
+                    if not copy:
+
+                        break
+
+                    raw = raw.copy()
+
+                    if int(self.meta['seq'][slot]) == latest:
+
+                        break
+
+                    continue
+
+            if time.perf_counter() >= deadline:
+
+                return None
+
+            time.sleep(period)
+
+        frame = Frame(raw, float(m['samplerate']),
+                      tuple(m['vdiv']), float(m['t0']),
+                      [tuple(c) for c in m['cal']], int(m['channels']))
+
+        if self.seq:
+
+            self.skipped += latest - self.seq - 1
+
+        self.seq = latest
+
+        return frame
+
+    def valid(self):
+
+        # False if the producer has already reused the slot of the last frame
+        slot = self.seq % len(self.meta)
+
+        return int(self.meta['seq'][slot]) == self.seq
+
+    def close(self):
+
+        del self.header, self.meta, self.data
+
+        try:
+
+            self.shm.close()
+
+        except BufferError:
+
+            # Frames given out still refer to the ring
+            pass
+
+        if self.owner:
+
+            self.shm.unlink()
@@ -0,0 +1,350 @@
+import array, itertools, threading, time
+from collections import Counter
+import numpy as np
+import usb.core
+
+from pyhantek6022BE import VDIV_N, SR_N, FW_CPUCS
+
+#%% Settings
+
+# Practical bulk throughput of USB 2.0 high speed, bytes / s
+USB2_BANDWIDTH = 40_000_000
+
+#%% Funcs
+
+def sine(freq = 1_000., ampl = 2., offset = 0.):
+
+    return lambda t: offset + ampl * np.sin(2. * np.pi * freq * t)
+
+def square(freq = 1_000., ampl = 2., offset = 0.):
+
+    return lambda t: offset + ampl * np.where((t * freq) % 1. < 0.5, 1., -1.)
+
+def quantize(volts, vdiv):
+
+    # Inverse of the Hantek conversion: (x - 128) / 255 * 10 * VDiv
+    code = np.rint(volts / (10. * vdiv) * 255. + 128.)
+
+    return np.clip(code, 0, 255).astype(np.uint8)
+
+#%% Classes
+
+class SimEndpoint:
+
+    def __init__(self, address):
+
+        self.bEndpointAddress = address
+
+class HantekSim:
+
+    # Software stand-in for Hantek 6022BE with the pyusb Device interface.
+    # source:
+    #   None               - sine on Ch1, square on Ch2
+    #   (func1, func2)     - functions of time t (s) returning volts
+    #   bytes / ndarray    - raw interleaved dump, served cyclically
+    #   str                - path to raw interleaved dump
+    # bandwidth - bytes / s of emulated bus (USB2_BANDWIDTH), None - no limit
+    # realtime  - data can't come faster than the ADC samples it
+    # noise     - rms noise, volts
+    # loaded    - firmware is loaded, else the device is 0x04b4 until the
+    #             firmware upload releases CPUCS, then re-enumerates after
+    #             renum_delay, s
+    # latency   - s per control transfer
+    # bus, port - place on the bus (pyusb bus / port_numbers)
+
+    def __init__(self, source = None, bandwidth = None, realtime = False,
+                 noise = 0., serial = 'SIM00001', loaded = True,
+                 renum_delay = 0.5, latency = 0., bus = 1, port = 1):
+
+        self.idProduct = 0x6022
+        self.serial_number = serial
+        self.bus = bus
+        self.port_numbers = (port,)
+        self.address = port
+        self.renum_delay = renum_delay
+        self.renum_at = 0. if loaded else None
+        self.latency = latency
+
+        if source is None:
+
+            source = (sine(), square())
+
+        if isinstance(source, str):
+
+            source = np.fromfile(source, dtype = np.uint8)
+
+        if isinstance(source, (bytes, bytearray, memoryview)):
+
+            source = np.frombuffer(source, dtype = np.uint8)
+
+        if isinstance(source, np.ndarray):
+
+            self.raw = source.astype(np.uint8, copy = False).ravel()
+            self.funcs = None
+
+        else:
+
+            self.raw = None
+            self.funcs = source
+
+        self.bandwidth = bandwidth
+        self.realtime = realtime
+        self.noise = noise
+        self.rng = np.random.default_rng(0)
+
+        self.eeprom = bytearray(b'\x80' * 256)
+        self.memory = bytearray(0x10000)
+
+        self.config = {(0, 0): [SimEndpoint(0x02), SimEndpoint(0x86)]}
+
+        # Number of control transfers per bRequest and bulk bytes served
+        self.transfers = Counter()
+        self.bytes_read = 0
+
+        # Bulk reads are served one at a time in call order, like the
+        # transfers queued on an endpoint: a ticket on the call (atomic, no
+        # wait - a Lock doesn't wake its waiters in order)
+        self.tickets = itertools.count()
+        self.served = 0
+        self.cond = threading.Condition()
+
+        self.reset()
+
+    def reset(self):
+
+        self.vdiv_code = [1, 1]
+        self.sr_code = 16
+        self.channels = 2
+        self.running = False
+        self.position = 0 # sample counter of the stream
+        self.ready_at = 0.
+
+    @property
+    def idVendor(self):
+
+        if self.renum_at is not None and time.perf_counter() >= self.renum_at:
+
+            return 0x04b5
+
+        return 0x04b4
+
+    def get_active_configuration(self):
+
+        return self.config
+
+    def ctrl_transfer(self, bmRequestType, bRequest, wValue = 0, wIndex = 0,
+                      data_or_wLength = None, timeout = None):
+
+        self.transfers[bRequest] += 1
+
+        if self.latency:
+
+            time.sleep(self.latency)
+
+        if bmRequestType & 0x80:
+
+            # IN: 162 - EEPROM read, wValue is offset
+            if bRequest == 162:
+
+                return array.array('B', self.eeprom[wValue:wValue + data_or_wLength])
+
+            raise usb.core.USBError('Pipe error', errno = 32)
+
+        data = bytes(data_or_wLength or b'')
+
+        if bRequest == 160:
+
+            if wValue in FW_CPUCS:
+
+                # 0 - CPU runs and the device re-enumerates, 1 - reset
+                self.renum_at = time.perf_counter() + self.renum_delay \
+                    if data[0] == 0 else None
+
+            else:
+
+                self.memory[wValue:wValue + len(data)] = data
+
+        elif bRequest in (224, 225):
+
+            if data[0] not in VDIV_N:
+
+                raise usb.core.USBError('Pipe error', errno = 32)
+
+            self.vdiv_code[bRequest - 224] = data[0]
+
+        elif bRequest == 226:
+
+            if data[0] not in SR_N:
+
+                raise usb.core.USBError('Pipe error', errno = 32)
+
+            self.sr_code = data[0]
+
+        elif bRequest == 228:
+
+            if data[0] not in (1, 2):
+
+                raise usb.core.USBError('Pipe error', errno = 32)
+
+            self.channels = data[0]
+
+        elif bRequest == 227:
+
+            # 1 - start, 0 - stop
+            self.running = bool(data[0])
+            self.ready_at = time.perf_counter()
+
+        else:
+
+            raise usb.core.USBError('Pipe error', errno = 32)
+
+        return len(data)
+
+    def samples(self, start, n, out = None):
+
+        # Interleaved bytes of n samples per channel from sample start,
+        # Ch1 only in single channel mode. out - uint8 buffer of c * n bytes
+        c = self.channels
+
+        if out is None:
+
+            out = np.empty(c * n, dtype = np.uint8)
+
+        if self.funcs is not None:
+
+            t = (start + np.arange(n)) / SR_N[self.sr_code]
+
+            for i in range(c):
+
+                v = self.funcs[i](t)
+
+                if self.noise:
+
+                    v = v + self.rng.normal(0., self.noise, n)
+
+                out[i::c] = quantize(v, VDIV_N[self.vdiv_code[i]])
+
+            return out
+
+        raw = self.raw if c == 2 else self.raw[:len(self.raw) // 2 * 2:2]
+
+        pos = 0
+        a = c * start % len(raw)
+
+        while pos < len(out):
+
+            m = min(len(out) - pos, len(raw) - a)
+
+            out[pos:pos + m] = raw[a:a + m]
+
+            pos += m
+            a = 0
+
+        return out
+
+    def read(self, endpoint, size_or_buffer, timeout = None):
+
+        ticket = next(self.tickets)
+
+        with self.cond:
+
+            self.cond.wait_for(lambda: self.served == ticket)
+
+        try:
+
+            return self.bulk(endpoint, size_or_buffer, timeout)
+
+        finally:
+
+            with self.cond:
+
+                self.served += 1
+
+                self.cond.notify_all()
+
+    def bulk(self, endpoint, size_or_buffer, timeout = None):
+
+        if endpoint != 0x86:
+
+            raise usb.core.USBError('Invalid param', errno = 22)
+
+        if isinstance(size_or_buffer, int):
+
+            buf = None
+            length = size_or_buffer
+
+        else:
+
+            buf = memoryview(size_or_buffer).cast('B')
+            length = len(buf)
+
+        if not self.running:
+
+            raise usb.core.USBTimeoutError('Operation timed out', errno = 110)
+
+        n = length // self.channels
+
+        start = self.position
+
+        self.position += n
+        self.bytes_read += self.channels * n
+
+        # Emulated transfer time, counted from the end of the previous one
+        duration = 0.
+
+        if self.bandwidth:
+
+            duration = length / self.bandwidth
+
+        if self.realtime:
+
+            duration = max(duration, length / self.channels / SR_N[self.sr_code])
+
+        if duration:
+
+            now = time.perf_counter()
+
+            self.ready_at = max(self.ready_at, now - duration) + duration
+
+            if timeout and self.ready_at - now > timeout / 1000.:
+
+                time.sleep(timeout / 1000.)
+
+                raise usb.core.USBTimeoutError('Operation timed out', errno = 110)
+
+            time.sleep(max(self.ready_at - now, 0.))
+
+        # Straight into the caller's buffer or the returned array, as pyusb
+        # does: a raw dump costs no memory of its own
+        if buf is None:
+
+            result = array.array('B', [0]) * (self.channels * n)
+
+            self.samples(start, n, np.frombuffer(result, dtype = np.uint8))
+
+            return result
+
+        self.samples(start, n, np.frombuffer(buf, dtype = np.uint8, count = self.channels * n))
+
+        return self.channels * n
+
+class SimBus:
+
+    # Stand-in for usb.core.find over a set of simulated devices:
+    # Hantek(find = SimBus(HantekSim(loaded = False)).find)
+
+    def __init__(self, *devices):
+
+        self.devices = list(devices)
+
+    def find(self, find_all = False, custom_match = None, **args):
+
+        found = [d for d in self.devices
+                 if all(getattr(d, k) == v for k, v in args.items())
+                 and (custom_match is None or custom_match(d))]
+
+        if find_all:
+
+            return iter(found)
+
+        return found[0] if found else None
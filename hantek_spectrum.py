@@ -0,0 +1,195 @@
+import numpy as np
+
+#%% Settings
+
+# Cosine sum windows, periodic (DFT-even): w = sum (-1)^k a_k cos(2 pi k n / N)
+WINDOWS = {'rect': (1.,),
+           'hann': (0.5, 0.5),
+           'hamming': (0.54, 0.46),
+           'blackman': (0.42, 0.5, 0.08),
+           'flattop': (0.21557895, 0.41663158, 0.277263158, 0.083578947, 0.006947368)}
+
+UNITS = ['dBV', 'dBm', 'Vrms', 'V2/Hz']
+
+# Segments per FFT batch: bounds the work buffer to BATCH * nfft float32
+BATCH = 64
+
+# (window, nfft) -> (w, sum w, sum w ** 2)
+CACHE = {}
+
+#%% Funcs
+
+def window(name, n):
+
+    key = (name, n)
+
+    if key not in CACHE:
+
+        k = np.arange(n) * 2. * np.pi / n
+
+        w = np.zeros(n)
+
+        for i, a in enumerate(WINDOWS[name]):
+
+            w += (-1) ** i * a * np.cos(i * k)
+
+        CACHE[key] = (w, w.sum(), (w ** 2).sum())
+
+    return CACHE[key]
+
+#%% Classes
+
+class Spectrum:
+
+    # Welch spectrum of one channel: segments of nfft samples overlapping by
+    # overlap, windowed, |rfft| ** 2 accumulated in place frame by frame.
+    # Consecutive stream frames (t0 continues) are joined, so segments
+    # cross frame boundaries; otherwise every frame starts anew.
+    # alpha - None: mean of everything since reset(), else exponential
+    # averaging with weight alpha per segment.
+
+    def __init__(self, nfft = 4096, window = 'hann', overlap = 0.5, ch = 0,
+                 alpha = None):
+
+        if window not in WINDOWS:
+
+            raise ValueError('Window must be one of %s' % list(WINDOWS))
+
+        self.nfft = nfft
+        self.window = window
+        self.step = max(int(nfft * (1. - overlap)), 1)
+        self.ch = ch
+        self.alpha = alpha
+
+        # Work buffer of windowed segments and one-sided bin weights
+        self.buf = np.empty((BATCH, nfft), dtype = np.float32)
+        self.onesided = np.full(nfft // 2 + 1, 2.)
+        self.onesided[0] = 1.
+
+        if nfft % 2 == 0:
+
+            self.onesided[-1] = 1.
+
+        self.reset()
+
+    def reset(self):
+
+        self.acc = np.zeros(self.nfft // 2 + 1)
+        self.count = 0
+        self.tail = None
+        self.next_t0 = None
+        self.samplerate = None
+        self.wscale = None
+
+    def feed(self, frame):
+
+        # Adds the segments of frame, returns their number
+        if frame.samplerate != self.samplerate:
+
+            self.reset()
+
+            self.samplerate = frame.samplerate
+
+        x = frame.ch(self.ch)
+
+        if self.tail is not None and frame.follows(self.next_t0):
+
+            x = np.concatenate((self.tail, x))
+
+        self.next_t0 = frame.t0 + len(frame) * frame.dt
+
+        zero, scale = frame.cal[self.ch]
+
+        # Window times volts per code, only when VDiv or calibration change
+        if self.wscale is None or self.wscale[0] != scale:
+
+            w = window(self.window, self.nfft)[0]
+
+            self.wscale = (scale, (w * scale).astype(np.float32))
+
+        wscale = self.wscale[1]
+
+        k = (len(x) - self.nfft) // self.step + 1 if len(x) >= self.nfft else 0
+
+        if k:
+
+            segs = np.lib.stride_tricks.sliding_window_view(x, self.nfft)[::self.step]
+
+            for a in range(0, k, BATCH):
+
+                b = min(a + BATCH, k)
+
+                buf = self.buf[:b - a]
+
+                np.subtract(segs[a:b], zero, out = buf, dtype = np.float32)
+                np.multiply(buf, wscale, out = buf)
+
+                X = np.fft.rfft(buf, axis = 1)
+
+                p = X.real * X.real
+                p += X.imag * X.imag
+
+                self.add(p.sum(axis = 0, dtype = np.float64), b - a)
+
+        self.tail = x[k * self.step:].copy()
+
+        return k
+
+    def add(self, p, m):
+
+        # p - sum of the powers of m segments. acc / count is the average:
+        # a sum for the mean, the average itself (count 1) for exponential
+        if self.alpha is None:
+
+            self.acc += p
+            self.count += m
+
+        elif self.count == 0:
+
+            self.acc[:] = p / m
+            self.count = 1
+
+        else:
+
+            # m segments with weight alpha each: the average decays by
+            # (1 - alpha) ** m
+            d = (1. - self.alpha) ** m
+
+            self.acc *= d
+            self.acc += (1. - d) / m * p
+
+    def freqs(self):
+
+        return np.fft.rfftfreq(self.nfft, 1. / (self.samplerate or 1.))
+
+    def power(self):
+
+        # Mean power of every bin, Vrms ** 2 of a sine at the bin frequency
+        w, s1, s2 = window(self.window, self.nfft)
+
+        return self.acc / max(self.count, 1) * self.onesided / s1 ** 2
+
+    def spectrum(self, units = 'dBV', impedance = 50.):
+
+        # dBV, dBm (into impedance, Ohm), Vrms or V2/Hz (power spectral density)
+        if units == 'V2/Hz':
+
+            w, s1, s2 = window(self.window, self.nfft)
+
+            return self.acc / max(self.count, 1) * self.onesided / (self.samplerate * s2)
+
+        p = self.power()
+
+        if units == 'Vrms':
+
+            return np.sqrt(p)
+
+        if units == 'dBm':
+
+            p = p / impedance / 1e-3
+
+        elif units != 'dBV':
+
+            raise ValueError('Units must be one of %s' % UNITS)
+
+        return 10. * np.log10(np.maximum(p, 1e-20))
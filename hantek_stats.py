@@ -0,0 +1,129 @@
+import time
+from collections import Counter
+
+#%% Settings
+
+# Histogram bins: bin k holds durations of [2 ** (k - 1), 2 ** k) us
+BINS = 32
+
+#%% Classes
+
+class Stats:
+
+    # Per stage timing histograms and counters of the acquisition pipeline.
+    # Owners keep None instead of a Stats when instrumentation is off, so the
+    # hot path costs one "is not None" check.
+
+    def __init__(self):
+
+        self.reset()
+
+    def reset(self):
+
+        self.start = time.perf_counter()
+        self.stages = {} # stage -> [count, total, min, max, histogram]
+        self.counters = Counter()
+
+    def record(self, stage, dt):
+
+        s = self.stages.get(stage)
+
+        if s is None:
+
+            s = self.stages[stage] = [0, 0., dt, dt, [0] * BINS]
+
+        s[0] += 1
+        s[1] += dt
+
+        if dt < s[2]:
+
+            s[2] = dt
+
+        if dt > s[3]:
+
+            s[3] = dt
+
+        s[4][min(int(dt * 1e6).bit_length(), BINS - 1)] += 1
+
+    def add(self, name, n = 1):
+
+        self.counters[name] += n
+
+    def timer(self, stage):
+
+        return Timer(self, stage)
+
+    def percentile(self, stage, q):
+
+        # Upper bound of the histogram bin holding the q-th percentile, s
+        count, hist = self.stages[stage][0], self.stages[stage][4]
+
+        acc = 0
+
+        for k, n in enumerate(hist):
+
+            acc += n
+
+            if acc >= q / 100. * count:
+
+                return 2 ** k / 1e6
+
+        return 2 ** (BINS - 1) / 1e6
+
+    def summary(self):
+
+        elapsed = time.perf_counter() - self.start
+
+        stages = {}
+
+        for name, (count, total, tmin, tmax, hist) in self.stages.items():
+
+            stages[name] = {'count': count,
+                            'mean_ms': 1000. * total / count,
+                            'min_ms': 1000. * tmin,
+                            'max_ms': 1000. * tmax,
+                            'p50_ms': 1000. * self.percentile(name, 50),
+                            'p99_ms': 1000. * self.percentile(name, 99),
+                            'hist_us': {2 ** k: n for k, n in enumerate(hist) if n}}
+
+        return {'elapsed_s': elapsed,
+                'bytes_per_s': self.counters['bytes'] / elapsed,
+                'frames_per_s': self.counters['frames'] / elapsed,
+                'counters': dict(self.counters),
+                'stages': stages}
+
+    def report(self):
+
+        s = self.summary()
+
+        print('%.1f frames / s, %.1f MB / s' % (s['frames_per_s'],
+                                              s['bytes_per_s'] / 1e6))
+
+        for name, st in s['stages'].items():
+
+            print('%10s: %6d x %8.3f ms (min %.3f, p99 < %.3f, max %.3f)' %
+                  (name, st['count'], st['mean_ms'], st['min_ms'],
+                   st['p99_ms'], st['max_ms']))
+
+        for name, n in s['counters'].items():
+
+            if name not in ('bytes', 'frames'):
+
+                print('%10s: %d' % (name, n))
+
+class Timer:
+
+    def __init__(self, stats, stage):
+
+        self.stats = stats
+        self.stage = stage
+
+    def __enter__(self):
+
+        self.t0 = time.perf_counter()
+
+        return self
+
+    def __exit__(self, *args):
+
+        self.stats.record(self.stage, time.perf_counter() - self.t0)
@@ -0,0 +1,282 @@
+import threading, time
+import numpy as np
+import usb.core
+
+from pyhantek6022BE import Frame
+
+#%% Classes
+
+class Stream:
+
+    # Continuous acquisition: one start (227), then depth reader threads keep
+    # that many bulk transfers on EP 0x86 pending, so the device always has
+    # a transfer to fill while the host handles the one that completed.
+    # Transfers are submitted one after the other (libusb queues them per
+    # endpoint in that order; the thread that may submit next holds the GIL
+    # until its read is in libusb) and committed to a preallocated ring
+    # buffer in the same order. If the consumer falls behind by more than
+    # the ring, the oldest data is overwritten and counted in dropped
+    # (samples per channel). The data carries no sequence numbers, so
+    # samples the device itself loses are not seen in dropped. stop() stops
+    # sampling (227 with 0) and drains the device like Abort.
+    # The channel count (h0.channels) is fixed at start.
+    # size, transfer - bytes, transfer is a multiple of the 512 bytes packet
+
+    def __init__(self, h0, size = 1 << 24, transfer = 1 << 18, timeout = 1000,
+                 depth = 2):
+
+        if transfer % 512 or size % transfer:
+
+            raise ValueError('transfer must be a multiple of 512 and size a multiple of transfer')
+
+        if depth < 1 or depth * transfer > size:
+
+            raise ValueError('depth must be 1 or more transfers within the ring')
+
+        self.h0 = h0
+        self.ring = np.zeros(size, dtype = np.uint8)
+        self.transfer = transfer
+        self.timeout = timeout
+        self.depth = depth
+
+        self.cond = threading.Condition()
+        self.threads = []
+        self.running = False
+        self.error = None
+
+        self.written = 0 # bytes, total since start
+        self.consumed = 0
+        self.dropped = 0
+        self.errors = 0
+
+        # Transfers submitted / committed since start
+        self.submitted = 0
+        self.committed = 0
+
+    def __enter__(self):
+
+        self.start()
+
+        return self
+
+    def __exit__(self, *args):
+
+        self.stop()
+
+    def start(self):
+
+        if self.running:
+
+            return
+
+        self.samplerate = self.h0.samplerate
+        self.ChVDiv = tuple(self.h0.ChVDiv)
+        self.cal = self.h0.cal
+        self.channels = self.h0.channels
+
+        self.written = self.consumed = self.dropped = self.errors = 0
+        self.submitted = self.committed = 0
+        self.error = None
+        self.running = True
+
+        self.h0.ctrl(0x40, 227, b'\x01', 0, 0x00)
+
+        self.threads = [threading.Thread(target = self.run, args = (k,), daemon = True)
+                        for k in range(self.depth)]
+
+        for t in self.threads:
+
+            t.start()
+
+    def stop(self):
+
+        self.running = False
+
+        with self.cond:
+
+            self.cond.notify_all()
+
+        if self.threads:
+
+            for t in self.threads:
+
+                t.join()
+
+            self.threads = []
+
+            # The device keeps sampling otherwise, the next capture would get
+            # stale data
+            if self.error is None:
+
+                self.h0.Abort(len(self.ring))
+
+        with self.cond:
+
+            self.cond.notify_all()
+
+    def run(self, k):
+
+        # Reader k: transfers k, k + depth, k + 2 * depth ... into its own
+        # buffer, copied to the ring when all before it are there
+        ep = self.h0.ep6.bEndpointAddress
+        instr = self.h0.instr
+
+        buf = np.empty(self.transfer, dtype = np.uint8)
+        view = memoryview(buf)
+
+        ticket = k
+
+        while True:
+
+            with self.cond:
+
+                self.cond.wait_for(lambda: self.submitted == ticket or not self.running)
+
+                if not self.running:
+
+                    break
+
+                self.submitted += 1
+
+                self.cond.notify_all()
+
+            if instr is not None:
+
+                t0 = time.perf_counter()
+
+            n = 0
+
+            try:
+
+                n = self.h0.dev.read(ep, view, self.timeout)
+
+            except usb.core.USBTimeoutError:
+
+                self.errors += 1
+
+                if instr is not None:
+
+                    instr.add('usb_errors')
+                    instr.add('retries')
+
+            except usb.core.USBError as e:
+
+                self.errors += 1
+                self.error = e
+                self.running = False
+
+                if instr is not None:
+
+                    instr.add('usb_errors')
+
+            if instr is not None and n:
+
+                instr.record('bread', time.perf_counter() - t0)
+                instr.add('bytes', n)
+
+            with self.cond:
+
+                self.cond.wait_for(lambda: self.committed == ticket or not self.running)
+
+                if not self.running:
+
+                    self.cond.notify_all()
+
+                    break
+
+                self.commit(buf[:n])
+
+                self.committed += 1
+
+                self.cond.notify_all()
+
+            ticket += self.depth
+
+    def commit(self, data):
+
+        # Appends data to the ring (with cond held), over the oldest data if
+        # the consumer is behind
+        size = len(self.ring)
+        m = len(data)
+
+        over = self.written + m - self.consumed - size
+
+        if over > 0:
+
+            self.consumed += over
+            self.dropped += over // self.channels
+
+            if self.h0.instr is not None:
+
+                self.h0.instr.add('dropped_samples', over // self.channels)
+
+        w = self.written % size
+        first = min(m, size - w)
+
+        self.ring[w:w + first] = data[:first]
+        self.ring[:m - first] = data[first:]
+
+        self.written += m
+
+    def available(self):
+
+        # Samples per channel ready to be read
+        return (self.written - self.consumed) // self.channels
+
+    def read(self, n, out = None, timeout = None):
+
+        # Next n samples per channel as a Frame, gapless unless dropped grows.
+        # out - preallocated uint8 buffer of at least channels * n bytes
+        size = len(self.ring)
+        nbytes = self.channels * n
+
+        if nbytes > size - self.transfer:
+
+            raise ValueError('Frame is longer than the ring buffer allows')
+
+        if out is None:
+
+            out = np.empty(nbytes, dtype = np.uint8)
+
+        instr = self.h0.instr
+
+        with self.cond:
+
+            ready = self.cond.wait_for(
+                lambda: self.written - self.consumed >= nbytes or not self.running,
+                timeout)
+
+            if self.written - self.consumed < nbytes:
+
+                if self.error is not None:
+
+                    raise self.error
+
+                if not ready:
+
+                    raise TimeoutError('No data from the stream')
+
+                raise ValueError('Stream is stopped')
+
+            start = self.consumed
+            r = start % size
+            first = min(nbytes, size - r)
+
+            out[:first] = self.ring[r:r + first]
+            out[first:nbytes] = self.ring[:nbytes - first]
+
+            self.consumed += nbytes
+
+        if instr is not None:
+
+            instr.add('frames')
+
+        return Frame(out[:nbytes], self.samplerate, self.ChVDiv,
+                     start // self.channels / self.samplerate, self.cal,
+                     self.channels)
+
+    def frames(self, n):
+
+        while self.running or self.available() >= n:
+
+            yield self.read(n)
@@ -0,0 +1,227 @@
+import numpy as np
+
+#%% Settings
+
+RISE, FALL = 0, 1
+
+SWEEP_MODES = ['NORMAL', 'AUTO', 'SINGLE']
+
+#%% Funcs
+
+def edges(x, level, hysteresis = 4, slope = RISE, state = True):
+
+    # Trigger crossings in uint8 samples x. For RISE the trigger is armed when
+    # x < level - hysteresis and fires at the first x >= level after that
+    # (mirrored for FALL). state - True if fired / not armed at the start.
+    # Returns (indices, state at the end) to continue on the next chunk.
+    x = np.asarray(x)
+
+    if slope == FALL:
+
+        fire = x <= level
+        arm = x > level + hysteresis
+
+    else:
+
+        fire = x >= level
+        arm = x < level - hysteresis
+
+    idx = np.flatnonzero(fire | arm)
+
+    if not len(idx):
+
+        return idx, state
+
+    s = fire[idx]
+
+    prev = np.empty_like(s)
+    prev[0] = state
+    prev[1:] = s[:-1]
+
+    return idx[s & ~prev], bool(s[-1])
+
+def holdoff_filter(e, holdoff, last = None):
+
+    # Keep edges at least holdoff samples after the previous accepted one
+    if holdoff <= 0 or not len(e):
+
+        return e
+
+    keep = []
+
+    i = 0 if last is None else np.searchsorted(e, last + holdoff)
+
+    while i < len(e):
+
+        keep.append(e[i])
+
+        i = np.searchsorted(e, e[i] + holdoff, side = 'left')
+
+    return np.array(keep, dtype = e.dtype)
+
+#%% Classes
+
+class Trigger:
+
+    # Software trigger on the raw uint8 samples.
+    # source     - 0 - Ch1, 1 - Ch2
+    # level      - 0 - 255, код АЦП (128 - ноль)
+    # slope      - RISE / FALL
+    # sweep_mode - 'NORMAL', 'AUTO', 'SINGLE'
+    # position   - позиция горизонтального триггера, 0 - центр окна,
+    #              50 - начало окна, -50 - конец окна
+    # hysteresis - codes, holdoff - samples
+    # length     - samples per channel in the output window, None - half frame
+
+    def __init__(self, source = 0, level = 128, slope = RISE,
+                 sweep_mode = 'NORMAL', position = 0, hysteresis = 4,
+                 holdoff = 0, length = None):
+
+        if sweep_mode not in SWEEP_MODES:
+
+            raise ValueError('Sweep mode must be one of %s' % SWEEP_MODES)
+
+        self.source = source
+        self.level = level
+        self.slope = slope
+        self.sweep_mode = sweep_mode
+        self.position = position
+        self.hysteresis = hysteresis
+        self.holdoff = holdoff
+        self.length = length
+
+        self.triggered = False
+
+        self.arm()
+
+    def arm(self):
+
+        # Rearm SINGLE and forget the stream history
+        self.armed = True
+        self.state = True
+        self.last = None
+        self.pos = 0
+        self.buf = None
+        self.buf_start = 0
+        self.pending = []
+
+    def window(self, n):
+
+        # (length, pre-trigger samples) for frames of n samples per channel
+        length = self.length or n // 2
+        pre = int(round(length * (50 - self.position) / 100.))
+
+        return length, min(max(pre, 0), length)
+
+    def find(self, x):
+
+        e, self.state = edges(x, self.level, self.hysteresis, self.slope,
+                              self.state)
+
+        return e
+
+    def process(self, frame):
+
+        # One-shot frame: returns the triggered window as a Frame with the
+        # trigger at t = 0, or None (NORMAL, SINGLE after it fired)
+        self.triggered = False
+
+        if not self.armed:
+
+            return None
+
+        n = len(frame)
+        length, pre = self.window(n)
+
+        self.state = True
+
+        e = self.find(frame.ch(self.source))
+        e = e[(e >= pre) & (e - pre + length <= n)]
+        e = holdoff_filter(e, self.holdoff)
+
+        if len(e):
+
+            self.triggered = True
+
+            if self.sweep_mode == 'SINGLE':
+
+                self.armed = False
+
+            return self.cut(frame.raw, e[0] - pre, length, pre, frame)
+
+        if self.sweep_mode == 'AUTO':
+
+            return self.cut(frame.raw, 0, length, pre, frame)
+
+        return None
+
+    def cut(self, raw, start, length, pre, frame):
+
+        c = frame.channels
+
+        return frame.sub(raw[c * start:c * (start + length)],
+                         -pre / frame.samplerate)
+
+    def feed(self, frame):
+
+        # Consecutive frames of a stream (hantek_stream.Stream.read): edges
+        # and windows are found across frame boundaries. Returns the list of
+        # triggered windows completed by this frame.
+        n = len(frame)
+        length, pre = self.window(n)
+
+        out = []
+
+        if self.armed:
+
+            e = self.find(frame.ch(self.source)) + self.pos
+            e = e[e - pre >= self.buf_start]
+            e = holdoff_filter(e, self.holdoff, self.last)
+
+            if len(e):
+
+                self.last = int(e[-1])
+
+                if self.sweep_mode == 'SINGLE':
+
+                    e = e[:1]
+                    self.armed = False
+
+                self.pending.extend(e.tolist())
+
+        c = frame.channels
+
+        raw = frame.raw[:c * n]
+
+        self.buf = raw.copy() if self.buf is None else \
+            np.concatenate((self.buf, raw))
+
+        self.pos += n
+
+        while self.pending and self.pending[0] - pre + length <= self.pos:
+
+            start = self.pending.pop(0) - pre - self.buf_start
+
+            out.append(self.cut(self.buf, start, length, pre, frame))
+
+        self.triggered = bool(out)
+
+        if not out and self.sweep_mode == 'AUTO' and self.pos >= length:
+
+            start = self.pos - length - self.buf_start
+
+            out.append(frame.sub(self.buf[c * start:c * (start + length)], 0.))
+
+        # Keep the history that future windows may need
+        keep = self.pos - length
+
+        if self.pending:
+
+            keep = min(keep, self.pending[0] - pre)
+
+        if keep > self.buf_start:
+
+            self.buf = self.buf[c * (keep - self.buf_start):]
+            self.buf_start = keep
+
+        return out
@@ -0,0 +1,680 @@
+import threading, time
+import numpy as np
+import pytest
+import usb.core
+
+import pyhantek6022BE
+from pyhantek6022BE import Frame, Hantek, Config
+from hantek_sim import HantekSim, SimBus, quantize
+from hantek_stream import Stream
+from hantek_dsp import Oversampler, chain
+from hantek_decimate import Decimator, follow
+from hantek_shm import FrameRing
+from hantek_record import Recorder, Recording
+from hantek_server import FrameServer, FrameClient
+from hantek_calib import calibrate
+from hantek_spectrum import Spectrum
+from hantek_decode import UART
+import hantek_gaps
+
+#%% Funcs
+
+FS = 48_000_000
+
+def triangle(freq, ampl = 2.):
+
+    return lambda t: ampl * (4. * np.abs((t * freq) % 1. - 0.5) - 1.)
+
+def sawtooth(freq, ampl = 2.):
+
+    return lambda t: ampl * (2. * ((t * freq) % 1.) - 1.)
+
+def sine(freq, ampl = 2.):
+
+    return lambda t: ampl * np.sin(2. * np.pi * freq * t + 0.3)
+
+def gapped(funcs, gap, packets = 1000, noise = 0., vdiv = 0.5, channels = 2, seed = 0):
+
+    # 48 MS/s frame of functions of time with gap samples missing after
+    # every USB packet, as the device delivers it
+    p = hantek_gaps.PACKET * 2 // channels
+
+    n = (np.arange(packets)[:, None] * (p + gap) + np.arange(p)).ravel()
+
+    rng = np.random.default_rng(seed)
+
+    raw = np.empty((len(n), channels), dtype = np.uint8)
+
+    for i in range(channels):
+
+        v = funcs[i](n / FS)
+
+        if noise:
+
+            v = v + rng.normal(0., noise, len(n))
+
+        raw[:, i] = quantize(v, vdiv)
+
+    return Frame(raw.ravel(), FS, [vdiv] * 2, channels = channels)
+
+#%% Gaps (user-012)
+
+@pytest.mark.parametrize('gap', [0, 50, 100, 300, 700])
+@pytest.mark.parametrize('noise', [0., 0.01])
+def test_gap_of_triangle(gap, noise):
+
+    f = triangle(10_000)
+
+    g = hantek_gaps.estimate_gap(gapped((f, f), gap, noise = noise))
+
+    assert g is not None and abs(g - gap) <= max(1., 0.01 * gap)
+
+@pytest.mark.parametrize('gap', [50, 100])
+def test_gap_of_slow_sine(gap):
+
+    f = sine(10_000)
+
+    g = hantek_gaps.estimate_gap(gapped((f, f), gap, noise = 0.01))
+
+    assert g is not None and abs(g - gap) <= max(2., 0.02 * gap)
+
+@pytest.mark.parametrize('funcs', [(sine(1_000_000),) * 2, (triangle(500_000),) * 2,
+                                   (sine(30_000),) * 2, (lambda t: 0. * t,) * 2])
+def test_gap_unknown(funcs):
+
+    # Fast or bent or flat signals don't tell the gap
+    assert hantek_gaps.estimate_gap(gapped(funcs, 300)) is None
+
+def test_gap_never_wrong():
+
+    # Random signals and gaps: the right gap or None, never a guess
+    rng = np.random.default_rng(1)
+
+    shapes = [triangle, sawtooth, sine]
+
+    found = 0
+
+    for k in range(60):
+
+        shape = shapes[k % len(shapes)]
+        freq = 10 ** rng.uniform(3., 6.)
+        ampl = rng.uniform(0.3, 2.4)
+        gap = int(rng.integers(0, 900))
+
+        frame = gapped((shape(freq, ampl), shape(1.3 * freq, ampl)), gap, packets = 500,
+                       noise = rng.choice([0., 0.01, 0.05]),
+                       channels = 1 + k % 2, seed = k)
+
+        g = hantek_gaps.estimate_gap(frame)
+
+        if g is not None:
+
+            found += 1
+
+            assert abs(g - gap) <= max(2., 0.02 * gap), (shape.__name__, freq, gap, g)
+
+    assert found
+
+def test_packet_timing():
+
+    f = triangle(10_000)
+
+    frame = gapped((f, f), 100)
+
+    pt = hantek_gaps.PacketTiming(smooth = 1.)
+
+    assert abs(pt.update(frame) - 100) <= 1.
+
+    t = pt.timestamps(frame)
+
+    assert t[256] == pytest.approx(356 / FS, abs = 1. / FS)
+
+#%% Firmware (user-004)
+
+def replay(writes):
+
+    # (CPUCS address, value, RAM) at every CPUCS write of an upload
+    ram = bytearray(0x10000)
+    states = []
+
+    for wValue, data in writes:
+
+        if wValue in pyhantek6022BE.FW_CPUCS:
+
+            states.append((wValue, bytes(data), bytes(ram)))
+
+        else:
+
+            ram[wValue:wValue + len(data)] = data
+
+    return states, bytes(ram)
+
+@pytest.mark.parametrize('chunk', [64, pyhantek6022BE.FW_CHUNK])
+def test_firmware_image(chunk):
+
+    # The merged upload leaves the RAM as the original writes do whenever
+    # the CPU is started or stopped
+    original = [(w, bytes.fromhex(d)) for w, d in
+                zip(pyhantek6022BE.FW_WVALUE, pyhantek6022BE.FW_DATA)]
+
+    image = pyhantek6022BE.firmware_image(chunk)
+
+    assert replay(image) == replay(original)
+    assert all(len(d) <= chunk for w, d in image)
+    assert len(image) < len(original)
+
+def test_firmware_upload():
+
+    # Cold start of the simulator: the firmware as uploaded, 18 writes
+    sim = HantekSim(loaded = False, renum_delay = 0.05)
+
+    h0 = Hantek(find = SimBus(sim).find)
+
+    original = [(w, bytes.fromhex(d)) for w, d in
+                zip(pyhantek6022BE.FW_WVALUE, pyhantek6022BE.FW_DATA)]
+
+    ram = replay(original)[1]
+
+    used = sorted({a for w, d in original if w not in pyhantek6022BE.FW_CPUCS
+                   for a in range(w, w + len(d))})
+
+    assert sim.transfers[160] == 18
+    assert all(sim.memory[a] == ram[a] for a in used)
+
+#%% Settings (user-014)
+
+def test_apply_transfers():
+
+    # Only the control transfers that change something are sent
+    sim = HantekSim()
+
+    h0 = Hantek(sim)
+
+    h0.apply(Config(1_000_000, [1, 1], 2))
+
+    sim.transfers.clear()
+
+    assert h0.apply(Config(1_000_000, [1, 1], 2)) == 0
+    assert not sim.transfers
+
+    assert h0.apply(Config(ChVDiv = (None, 0.5))) == 1
+    assert sim.transfers == {225: 1}
+    assert h0.ChVDiv == [1, 0.5] and h0.cal[1] == (128., 10. / 255. * 0.5)
+
+    assert h0.apply(Config(4_000_000)) == 1
+    assert sim.transfers == {225: 1, 226: 1}
+    assert h0.data_len == h0.dictDatLen_N[4_000_000]
+
+def test_apply_partial(monkeypatch):
+
+    # The rate transfer fails after the channels one: the frames follow
+    # the single channel mode the device is in
+    sim = HantekSim()
+
+    h0 = Hantek(sim)
+
+    h0.apply(Config(1_000_000, [1, 1], 2))
+
+    ctrl_transfer = sim.ctrl_transfer
+
+    def broken(bmRequestType, bRequest, *args):
+
+        if bRequest == 226:
+
+            raise usb.core.USBError('Pipe error', errno = 32)
+
+        return ctrl_transfer(bmRequestType, bRequest, *args)
+
+    monkeypatch.setattr(sim, 'ctrl_transfer', broken)
+
+    with pytest.raises(usb.core.USBError):
+
+        h0.apply(Config(4_000_000, channels = 1))
+
+    assert h0.channels == 1 and h0.samplerate == 1_000_000
+    assert h0.buf_len == h0.data_len
+
+    frame = h0.Capture()
+
+    assert frame.channels == 1 and len(frame) == h0.data_len
+
+#%% Stream (user-003)
+
+@pytest.mark.parametrize('depth', [1, 2, 4])
+def test_stream_order(depth):
+
+    # A ramp through reads that overlap: no sample lost or out of order, and
+    # the device stops sampling with the stream
+    # 251 doesn't divide a transfer: swapped transfers break the ramp
+    ramp = np.tile(np.arange(251, dtype = np.uint8).repeat(2), 1000)
+
+    sim = HantekSim(ramp, bandwidth = 40_000_000)
+
+    h0 = Hantek(sim)
+
+    h0.apply(Config(1_000_000))
+
+    with Stream(h0, transfer = 1 << 16, depth = depth) as stream:
+
+        x = np.concatenate([stream.read(1 << 16).ch(0) for k in range(20)])
+
+    assert ((np.diff(x.astype(np.int16)) % 251) == 1).all()
+    assert stream.dropped == 0
+    assert not sim.running
+
+    assert h0.Capture() is not None
+
+#%% Chunked capture (user-011)
+
+@pytest.mark.parametrize('depth', [1, 2, 4])
+def test_capture_chunked(depth):
+
+    # Slices in order, depth reads pending at once, process sees every slice
+    ramp = np.tile(np.arange(251, dtype = np.uint8).repeat(2), 1000)
+
+    sim = HantekSim(ramp, bandwidth = 40_000_000)
+
+    h0 = Hantek(sim)
+
+    h0.apply(Config(16_000_000))
+
+    read = sim.read
+    state = {'pending': 0, 'most': 0}
+
+    def counted(*args):
+
+        state['pending'] += 1
+        state['most'] = max(state['most'], state['pending'])
+
+        try:
+
+            return read(*args)
+
+        finally:
+
+            state['pending'] -= 1
+
+    sim.read = counted
+
+    frame, results = h0.CaptureChunked(1 << 14, lambda f, k: (k, len(f)), depth = depth)
+
+    x = frame.ch(0)
+
+    assert ((np.diff(x.astype(np.int16)) % 251) == 1).all()
+    assert state['most'] == depth
+    assert [k for k, m in results] == list(range(0, len(frame), 1 << 13))
+
+def test_capture_chunked_cancel():
+
+    h0 = Hantek(HantekSim(bandwidth = 40_000_000))
+
+    h0.apply(Config(16_000_000))
+
+    cancel = threading.Event()
+
+    frame, results = h0.CaptureChunked(1 << 14, lambda f, k: cancel.set(), cancel = cancel)
+
+    assert frame is None and not h0.dev.running
+
+    assert h0.Capture() is not None
+
+#%% Oversampling (user-024)
+
+def test_oversampler_timing():
+
+    # Output t0 includes the group delay: the output matches the input
+    # signal at its own time stamps, not 64 us later
+    f = sine(5_000., 1.5)
+
+    # At the ADC rate: the filters keep up, nothing is dropped
+    h0 = Hantek(HantekSim((f, f), noise = 0.05, realtime = True))
+
+    h0.apply(Config(16_000_000, [0.5, 0.5]))
+
+    ov = Oversampler(chain(160))
+
+    out = []
+
+    with Stream(h0) as stream:
+
+        for k in range(8):
+
+            frame = ov.feed(stream.read(1 << 18))
+
+            if frame is not None:
+
+                out.append(frame)
+
+    assert stream.dropped == 0
+
+    # After the filters settled
+    t = np.concatenate([o.time() for o in out[2:]])
+    v = np.concatenate([o.volts(0) for o in out[2:]])
+
+    err = {lag: np.std(v - f(t + lag)) for lag in (-1e-6, 0., 1e-6, ov.delay / 16e6)}
+
+    assert err[0.] < 0.03
+    assert err[0.] < min(err[-1e-6], err[1e-6])
+    assert err[ov.delay / 16e6] > 10 * err[0.]
+
+def test_oversampler_drop():
+
+    # One 8 ms transfer missing an hour into a stream: the filters start
+    # anew and the outputs after it keep their times
+    f = sine(5_000., 1.5)
+
+    n = 131072
+    T0 = 3600.
+    sr = 16_000_000
+
+    ov = Oversampler(chain(160))
+
+    out = []
+
+    for k in range(12):
+
+        if k == 4:
+
+            continue
+
+        t = T0 + (k * n + np.arange(n)) / sr
+
+        raw = np.repeat(quantize(f(t), 0.5), 2)
+
+        frame = ov.feed(Frame(raw, sr, (0.5, 0.5), T0 + k * n / sr))
+
+        if frame is not None and k >= 8:
+
+            out.append(frame)
+
+    t = np.concatenate([o.time() for o in out])
+    v = np.concatenate([o.volts(0) for o in out])
+
+    assert np.std(v - f(t)) < 0.03
+
+def test_oversampled_view():
+
+    # The viewer's range logic over Stream frames: the visible range moves
+    # with t0, every frame keeps its points (a fixed range went blank)
+    h0 = Hantek(HantekSim(realtime = True))
+
+    h0.apply(Config(16_000_000))
+
+    ov = Oversampler(chain(160))
+    dec = Decimator('minmax')
+
+    t_range = last = None
+    points = []
+
+    with Stream(h0) as stream:
+
+        while len(points) < 5:
+
+            frame = ov.feed(stream.read(1 << 18))
+
+            if frame is None:
+
+                continue
+
+            if t_range is None:
+
+                t_range = frame.t0, frame.t0 + len(frame) * frame.dt
+
+            else:
+
+                t_range = follow(t_range, last, frame)
+
+            last = frame.t0
+
+            t, v = dec(frame, 0, 800, t_range)
+
+            assert t[0] >= frame.t0 and t[-1] < frame.t0 + len(frame) * frame.dt
+
+            # All of the frame, as without a range
+            assert len(t) == len(dec(frame, 0, 800)[0])
+
+            points.append(len(t))
+
+def test_ring_int16():
+
+    ring = FrameRing()
+    viewer = FrameRing(ring.name)
+
+    raw = np.arange(-5, 5, dtype = np.int16)
+
+    ring.put(Frame(raw, 100_000, (1, 1), 0.5, [(0., 1.), (0., 1.)]))
+
+    frame = viewer.get()
+
+    assert frame.raw.dtype == np.int16 and (frame.raw == raw).all() and frame.t0 == 0.5
+
+    del frame
+
+    viewer.close()
+    ring.close()
+
+def test_ring_reuse():
+
+    # The producer reuses the slot of a frame still in use: a view is no
+    # longer valid, a copy keeps its data
+    ring = FrameRing(slots = 2)
+    viewer = FrameRing(ring.name)
+
+    def frame(k):
+
+        return Frame(np.full(1000, k, dtype = np.uint8), 100_000, (1, 1), float(k))
+
+    ring.put(frame(1))
+
+    view = viewer.get()
+
+    assert viewer.valid()
+
+    ring.put(frame(2))
+    ring.put(frame(3))
+
+    assert not viewer.valid() and view.raw[0] == 3
+
+    copied = viewer.get(copy = True)
+
+    ring.put(frame(4))
+    ring.put(frame(5))
+
+    assert (copied.raw == 3).all() and copied.t0 == 3.
+
+    del view
+
+    viewer.close()
+    ring.close()
+
+#%% Recording (user-013)
+
+def test_recording(tmp_path):
+
+    # Channels and sample type of every chunk come back from the index
+    path = str(tmp_path / 'rec')
+
+    with Recorder(path) as rec:
+
+        rec.write(Frame(np.arange(200, dtype = np.uint8), 1e6, (1, 1)))
+        rec.write(Frame(np.arange(100, dtype = np.uint8), 1e6, (1, 1), 1e-4, channels = 1))
+
+        with pytest.raises(ValueError):
+
+            rec.write(Frame(np.zeros(10, dtype = np.int16), 1e6, (1, 1)))
+
+    r = Recording(path)
+
+    assert len(r) == 200 and [r.frame(k).channels for k in range(2)] == [2, 1]
+    assert (r.frame(1).ch(0) == np.arange(100)).all()
+
+    with Recorder(path) as rec:
+
+        rec.write(Frame(np.arange(-5, 5, dtype = np.int16), 1e5, (1, 1)))
+
+    r = Recording(path)
+
+    assert r.dtype == np.int16 and (r.ch(1) == np.arange(-4, 5, 2)).all()
+
+#%% Server (user-016)
+
+def test_server_slow_client():
+
+    # A client back from a pause gets the latest frame, not the ones queued
+    # in the socket buffers while it was away
+    h0 = Hantek(HantekSim())
+
+    h0.apply(Config(1_000_000))
+
+    with FrameServer(h0, ('127.0.0.1', 0)) as server:
+
+        with FrameClient(server.address) as client:
+
+            seq, frame = client.read()
+
+            time.sleep(1.)
+
+            seq, frame = client.read()
+
+            assert server.seq - seq <= 2
+
+            assert len(frame) == h0.data_len // 2
+
+def test_server_usb_error(monkeypatch):
+
+    # A USB error of a control message stops the server, the client sees it
+    h0 = Hantek(HantekSim())
+
+    def broken(config):
+
+        raise usb.core.USBError('device is gone')
+
+    with FrameServer(h0, ('127.0.0.1', 0)) as server:
+
+        with FrameClient(server.address) as client:
+
+            client.read()
+
+            monkeypatch.setattr(h0, 'apply', broken)
+
+            client.set(samplerate = 1_000_000)
+
+            with pytest.raises(ConnectionError, match = 'device is gone'):
+
+                for k in range(1000):
+
+                    client.read()
+
+        assert not server.running
+
+#%% Calibration (user-009)
+
+def reference(sim, scale = 1.):
+
+    # ask() of calibrate: grounds the simulated inputs, then applies
+    # scale times the reference it asks for
+    def ask(text):
+
+        volts = float(text.split()[1]) * scale if text.startswith('Apply') else 0.
+
+        sim.funcs = (lambda t: volts + 0. * t,) * 2
+
+    return ask
+
+@pytest.mark.parametrize('channels', [1, 2])
+def test_calibrate(channels):
+
+    sim = HantekSim()
+
+    h0 = Hantek(sim)
+
+    h0.apply(Config(1_000_000, channels = channels))
+
+    cal = calibrate(h0, [1., 0.5], ask = reference(sim))
+
+    assert sorted(cal.gain) == sorted((ch, v) for ch in range(channels) for v in (1., 0.5))
+
+    for g in cal.gain.values():
+
+        assert g == pytest.approx(1., abs = 0.02)
+
+def test_calibrate_implausible():
+
+    # Half the reference: the gains stay nominal
+    sim = HantekSim()
+
+    h0 = Hantek(sim)
+
+    cal = calibrate(h0, [1.], ask = reference(sim, 0.5))
+
+    assert cal.gain == {}
+
+#%% Stream gaps (user-017, user-021)
+
+def uart(values, starts, n, baud = 10_000, sr = 1_000_000):
+
+    # 3.3 V UART line of n samples, bytes values from sample starts
+    x = np.full(n, 3.3)
+
+    spb = sr // baud
+
+    for v, a in zip(values, starts):
+
+        bits = [0] + [(v >> i) & 1 for i in range(8)] + [1]
+
+        x[a:a + 10 * spb] = np.repeat(np.array(bits) * 3.3, spb)
+
+    return x
+
+def test_decode_drop():
+
+    # A frame missing an hour into a stream: the bytes after it keep their
+    # times, the byte cut by the drop is not made of two pieces
+    sr = 1_000_000
+    n = 8192
+    T0 = 3600.
+
+    starts = np.arange(100, 12 * n, 3000)
+    values = np.arange(len(starts)) % 256
+
+    x = uart(values, starts, 12 * n)
+
+    dec = UART(10_000)
+
+    out = []
+
+    for k in range(12):
+
+        if k == 5:
+
+            continue
+
+        raw = np.repeat(quantize(x[k * n:(k + 1) * n], 1.), 2)
+
+        out.append(dec.feed(Frame(raw, sr, (1., 1.), T0 + k * n / sr)))
+
+    out = np.concatenate(out)
+
+    t = T0 + starts / sr
+
+    i = np.searchsorted(t, out['t'] - 0.5 / sr)
+
+    assert (np.abs(out['t'] - t[i]) < 2. / sr).all()
+    assert (out['value'] == values[i]).all()
+
+    # Only the bytes of the missing frame are lost
+    assert len(out) == len(starts) - sum((5 * n <= starts) & (starts < 6 * n + 1000))
+
+def test_spectrum_drop():
+
+    # Frames with a gap at a large t0 are not joined across it
+    spec = Spectrum(4096)
+
+    raw = np.full(2 * 3000, 128, dtype = np.uint8)
+
+    for k in (0, 1, 3):
+
+        spec.feed(Frame(raw, 1_000_000, (1., 1.), 3600. + k * 3000e-6))
+
+    # 6000 joined samples: one segment; the last frame alone: none
+    assert spec.count == 1